@@ -1,9 +1,10 @@
 # Updated admin.py
 from django.contrib import admin
+from django.utils import timezone
 from django import forms
 from .models import AgentDetails, BlogPost
 from django.utils.html import format_html, strip_tags
-from .models import Contact, BlogPost, AgentDetails
+from .models import Contact, BlogPost, AgentDetails, ImportRun, TranslationMemory, BackgroundJob
 from django.utils.safestring import mark_safe
 
 @admin.register(BlogPost)
@@ -213,4 +214,43 @@ class AgentDetailsAdmin(admin.ModelAdmin):
     # class Media:
     #     js = (
     #         'utils/agent-rating-preview.js',  # Optional for live rating display
-    #     )
\ No newline at end of file
+    #     )
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'started_at', 'finished_at', 'last_completed_page', 'properties_fetched',
+                    'properties_written', 'properties_per_second', 'requests_per_second', 'bytes_downloaded')
+    list_filter = ('status',)
+    ordering = ('-started_at',)
+    exclude = ('listed_ids', 'completed_ids')
+    readonly_fields = ('status', 'resumed_from', 'started_at', 'checkpoint_at', 'finished_at', 'last_completed_page',
+                       'pages_fetched', 'properties_fetched', 'properties_written', 'properties_skipped',
+                       'requests', 'bytes_downloaded', 'error')
+
+    def properties_per_second(self, obj):
+        return f"{obj.properties_per_second:.1f}"
+
+    def requests_per_second(self, obj):
+        return f"{obj.requests_per_second:.1f}"
+
+
+@admin.register(TranslationMemory)
+class TranslationMemoryAdmin(admin.ModelAdmin):
+    list_display = ('language', 'source', 'translation', 'provider', 'created_at')
+    list_filter = ('language', 'provider')
+    search_fields = ('source', 'translation')
+    readonly_fields = ('source_hash', 'created_at')
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('attempts', 'locked_at', 'finished_at', 'error', 'created_at')
+    actions = ['retry_now']
+
+    @admin.action(description="Retry selected jobs now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='running').update(status='pending', attempts=0, run_after=timezone.now(), error='')
+        self.message_user(request, f"{updated} jobs queued again.")
@@ -5,3 +5,4 @@ class BlogConfig(AppConfig):
 
     def ready(self):
         import api.blog.signals
+        import api.blog.tasks
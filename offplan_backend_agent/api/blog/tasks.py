@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from api.jobs import job
+from api.models import BlogPost
+from api.blog.signals import TRANSLATE_BLOG_POST
+from api.translation import TokenBucket, TranslationPipeline, get_provider, translate_html
+
+FIELDS_TO_TRANSLATE = ['title', 'excerpt', 'content', 'meta_title', 'meta_description']
+HTML_FIELDS = ['excerpt', 'content']
+LANGUAGES = [('ar', '_ar'), ('fa', '_fa')]
+
+# One pace for every blog job in this worker, however many run at once
+BUCKET = TokenBucket()
+
+
+def translate_language(pipeline, post, lang, suffix):
+    """
+    ({translated field: value}, {failed field: fallback value}) for the
+    fields of `post` still missing in `lang`. A failed plain field falls
+    back to the original text, a partly translated HTML field to the
+    segments that did translate.
+    """
+    values, fallbacks, plain = {}, {}, {}
+    for field in FIELDS_TO_TRANSLATE:
+        base_val = getattr(post, field)
+        name = f"{field}{suffix}"
+        if not base_val or getattr(post, name):
+            continue
+        if field in HTML_FIELDS:
+            # Text nodes are translated in place, so the markup survives as written
+            content, missing = translate_html(pipeline, base_val, lang)
+            (fallbacks if missing else values)[name] = content
+        else:
+            plain[name] = base_val
+
+    translated = pipeline.translate(list(plain.values()), lang)
+    for name, text in plain.items():
+        if text in translated:
+            values[name] = translated[text]
+        else:
+            fallbacks[name] = text
+    return values, fallbacks
+
+
+@job(TRANSLATE_BLOG_POST)
+def translate_blog_post(queued):
+    """
+    Fill the empty Arabic/Farsi fields of a blog post, both languages in
+    parallel. Fields that fail are retried with the job; on its last
+    attempt they keep their fallback value.
+    """
+    post = BlogPost.objects.filter(pk=queued.payload["post_id"]).first()
+    if post is None:
+        return
+
+    pipeline = TranslationPipeline(get_provider(), bucket=BUCKET)
+    with ThreadPoolExecutor(max_workers=len(LANGUAGES), thread_name_prefix="blog-translate") as executor:
+        results = list(executor.map(lambda language: translate_language(pipeline, post, *language), LANGUAGES))
+
+    values = {name: value for translated, _ in results for name, value in translated.items()}
+    fallbacks = {name: value for _, failed in results for name, value in failed.items()}
+    if fallbacks and queued.is_last_attempt:
+        values.update(fallbacks)
+        fallbacks = {}
+
+    # Save WITHOUT triggering the signal again
+    if values:
+        BlogPost.objects.filter(pk=post.pk).update(**values)
+    if fallbacks:
+        raise RuntimeError(f"Could not translate {', '.join(fallbacks)}")
@@ -0,0 +1,38 @@
+import time
+import threading
+
+from django.db.models import F
+
+from api.models import DataVersion
+
+REFERENCE_DATA = "reference-data"
+PROPERTY_DATA = "property-data"
+
+# Seconds an in-process copy of a version number is trusted before re-reading it
+VERSION_MAX_AGE = 5
+
+_versions = {}
+_lock = threading.Lock()
+
+
+def bump_version(name):
+    """Increment the named data version so every process drops its cached copy."""
+    updated = DataVersion.objects.filter(name=name).update(version=F("version") + 1)
+    if not updated:
+        DataVersion.objects.get_or_create(name=name, defaults={"version": 1})
+    with _lock:
+        _versions.pop(name, None)
+
+
+def get_version(name, max_age=VERSION_MAX_AGE):
+    """Return the current version of `name`, re-reading the table at most every `max_age` seconds."""
+    now = time.monotonic()
+    with _lock:
+        cached = _versions.get(name)
+        if cached and now - cached[1] < max_age:
+            return cached[0]
+
+    version = DataVersion.objects.filter(name=name).values_list("version", flat=True).first() or 0
+    with _lock:
+        _versions[name] = (version, now)
+    return version
@@ -0,0 +1,335 @@
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+ESTATY_BASE_URL = "https://panel.estaty.app/api/v1"
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_RATE = float(os.getenv("ESTATY_MAX_RPS", "20"))  # requests per second, all threads together
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+FILTERS_CACHE_TTL = 300  # seconds; /getFilters reference data changes rarely
+
+
+class AdaptiveRateLimiter:
+    """
+    Spaces requests to at most `rate` per second across threads. The rate is
+    halved whenever the API throttles us (THROTTLE_STATUSES) and recovers by
+    `recovery` per successful call, back up to `max_rate`.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, min_rate=1.0, max_rate=None, recovery=0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.recovery = recovery
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            current = time.monotonic()
+            slot = max(current, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > current:
+            time.sleep(slot - current)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+class _ThrottleAwareRetry(Retry):
+    """Retry that also tells the rate limiter about throttled attempts it retries."""
+
+    limiter = None
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.limiter = self.limiter
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if self.limiter and response is not None and response.status in THROTTLE_STATUSES:
+            self.limiter.throttled()
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class EstatyClient:
+    """
+    Pooled HTTP client for the Estaty API.
+
+    One requests.Session keeps connections alive across calls; failed calls
+    (connection errors and RETRY_STATUSES) are retried with exponential
+    backoff, honouring Retry-After. At most `max_per_host` requests are in
+    flight to one host at a time, however many threads share the client, and
+    an AdaptiveRateLimiter paces them to what the API accepts.
+
+    post() can cache decoded responses for `cache_ttl` seconds. metrics()
+    reports calls, failures, throttling, cache hits, bytes and time spent;
+    `requests_made` and `bytes_received` feed import run throughput stats.
+    """
+
+    def __init__(self, base_url=None, api_key=None, max_per_host=DEFAULT_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, rate=DEFAULT_RATE):
+        self.base_url = (base_url or os.getenv("ESTATY_BASE_URL") or ESTATY_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.limiter = AdaptiveRateLimiter(rate)
+        self._host_slots = {}
+        self._slots_lock = threading.Lock()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self.requests_made = 0
+        self.bytes_received = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.request_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+        retry = _ThrottleAwareRetry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # every Estaty endpoint is a read, POST included
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        retry.limiter = self.limiter
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "App-key": api_key if api_key is not None else os.getenv("ESTATY_API_KEY"),
+            "Content-Type": "application/json",
+        })
+        # ESTATY_RECORD_DIR captures every response as a replay fixture (api.estaty_replay)
+        if os.getenv("ESTATY_RECORD_DIR"):
+            from api.estaty_replay import FixtureStore
+            self.session.hooks["response"].append(FixtureStore(os.getenv("ESTATY_RECORD_DIR")).record_hook)
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def _record(self, nbytes, started, status=None):
+        with self._stats_lock:
+            self.requests_made += 1
+            self.bytes_received += nbytes
+            self.request_seconds += time.monotonic() - started
+            if status is None or status >= 400:
+                self.failures += 1
+        if status in THROTTLE_STATUSES:
+            self.limiter.throttled()
+        elif status is not None and status < 400:
+            self.limiter.succeeded()
+
+    def metrics(self):
+        with self._stats_lock:
+            return {
+                "requests": self.requests_made,
+                "failures": self.failures,
+                "cache_hits": self.cache_hits,
+                "bytes": self.bytes_received,
+                "avg_ms": self.request_seconds * 1000 / self.requests_made if self.requests_made else 0.0,
+                "rate": self.limiter.rate,
+            }
+
+    def summary(self):
+        m = self.metrics()
+        return (
+            f"{m['requests']} requests ({m['failures']} failed, {m['cache_hits']} cache hits), "
+            f"{m['bytes'] / 1024:.0f} KB, {m['avg_ms']:.0f} ms avg, pacing at {m['rate']:.1f} req/s"
+        )
+
+    def url(self, endpoint):
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def post(self, endpoint, payload=None, params=None, cache_ttl=None):
+        """POST to an Estaty endpoint and return the decoded JSON body, cached for `cache_ttl` seconds if given."""
+        if cache_ttl:
+            key = (endpoint, json.dumps(payload or {}, sort_keys=True), json.dumps(params or {}, sort_keys=True))
+            with self._cache_lock:
+                expires, data = self._cache.get(key, (0, None))
+            if expires > time.monotonic():
+                with self._stats_lock:
+                    self.cache_hits += 1
+                return copy.deepcopy(data)
+
+        url = self.url(endpoint)
+        self.limiter.wait()
+        started = time.monotonic()
+        try:
+            with self._host_slot(url):
+                response = self.session.post(url, json=payload or {}, params=params, timeout=self.timeout)
+        except requests.RequestException:
+            self._record(0, started)
+            raise
+        self._record(len(response.content), started, response.status_code)
+        response.raise_for_status()
+        data = response.json()
+
+        if cache_ttl:
+            with self._cache_lock:
+                self._cache[key] = (time.monotonic() + cache_ttl, copy.deepcopy(data))
+        return data
+
+    @contextmanager
+    def stream(self, endpoint, payload=None):
+        """POST to an Estaty endpoint and yield the response without reading its body."""
+        url = self.url(endpoint)
+        self.limiter.wait()
+        started = time.monotonic()
+        with self._host_slot(url):
+            try:
+                response = self.session.post(url, json=payload or {}, timeout=self.timeout, stream=True)
+            except requests.RequestException:
+                self._record(0, started)
+                raise
+            with response:
+                try:
+                    response.raise_for_status()
+                    yield response
+                finally:
+                    self._record(response.raw.tell(), started, response.status_code)
+
+    def get_filters(self, cache_ttl=FILTERS_CACHE_TTL):
+        """The /getFilters reference data (cities, districts, developers, types, statuses, facilities)."""
+        return self.post("getFilters", cache_ttl=cache_ttl)
+
+    def find_property(self, property_name):
+        """The first /filter match for a property title (with its apartments), or None."""
+        properties = self.post("filter", {"property_name": property_name}).get("properties")
+        return properties[0] if properties else None
+
+    def get_properties(self, page=1):
+        """One page of /getProperties summaries."""
+        data = self.post("getProperties", params={"page": page} if page > 1 else None)
+        return data.get("properties", {}).get("data", [])
+
+    def get_property(self, prop_id):
+        """The /getProperty detail payload of one property, or None."""
+        return self.post("getProperty", {"id": prop_id}).get("property")
+
+    def latest_updated_properties(self):
+        """The /latestUpdatedProperties window: [{"id", "title", "updated_at"}, ...], newest first."""
+        data = self.post("latestUpdatedProperties")
+        properties = data.get("properties") if isinstance(data, dict) else None
+        return properties if isinstance(properties, list) else []
+
+    def iter_property_ids(self):
+        """Walk /getProperties page by page until an empty page."""
+        page = 1
+        while True:
+            properties = self.get_properties(page)
+            if not properties:
+                return
+            for prop in properties:
+                if prop.get("id"):
+                    yield prop["id"]
+            page += 1
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def shared_client():
+    """The process-wide EstatyClient used by the sync scripts and commands without their own."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = EstatyClient()
+        return _shared_client
+
+
+_DONE = object()
+
+
+class DetailFetcher:
+    """
+    Fetch /getProperty details on `concurrency` worker threads.
+
+    iter_details() yields (prop_id, detail) as responses arrive; detail is
+    None when the call failed after retries (the id is then in `failed`) or
+    when Estaty answered without a property. Results pass through a queue of
+    `queue_size` entries, so slow consumers (the DB writer) hold the workers
+    back instead of buffering the whole catalogue in memory.
+    """
+
+    def __init__(self, client, concurrency=DEFAULT_CONCURRENCY, queue_size=None):
+        self.client = client
+        self.concurrency = concurrency
+        self.queue_size = queue_size or concurrency * 4
+        self.failed = set()
+
+    def iter_details(self, prop_ids):
+        ids = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        feed_errors = []
+
+        def feed():
+            try:
+                for prop_id in prop_ids:
+                    ids.put(prop_id)
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                for _ in range(self.concurrency):
+                    ids.put(_DONE)
+
+        def work():
+            while True:
+                prop_id = ids.get()
+                if prop_id is _DONE:
+                    results.put(_DONE)
+                    return
+                try:
+                    detail = self.client.get_property(prop_id)
+                except Exception as e:
+                    log.error(f"❌ Error fetching details for ID {prop_id}: {e}")
+                    self.failed.add(prop_id)
+                    detail = None
+                results.put((prop_id, detail))
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        threads += [threading.Thread(target=work, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+
+        running = self.concurrency
+        while running:
+            item = results.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            yield item
+
+        if feed_errors:
+            raise feed_errors[0]
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+log = logging.getLogger(__name__)
+
+# Image URLs inside recorded bodies ("\/"-escaped or not), rewritten to the stub on replay
+MEDIA_URL = re.compile(rb'https?:(?:\\?/){2}[^"\s]*?\.(jpe?g|png|webp|gif|svg)(?:\?[^"\s]*)?(?=")', re.I)
+
+# 1x1 transparent PNG served for every replayed image
+PLACEHOLDER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082"
+)
+
+
+def fixture_key(endpoint, query, body):
+    """Stable name of a recorded call: endpoint + sorted query + canonical JSON body."""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        payload = {}
+    canonical = "\n".join([
+        endpoint,
+        json.dumps(sorted(parse_qsl(query or "")), sort_keys=True),
+        json.dumps(payload, sort_keys=True),
+    ])
+    return f"{endpoint}-{hashlib.sha1(canonical.encode()).hexdigest()[:16]}"
+
+
+class FixtureStore:
+    """
+    Estaty responses on disk: "<key>.json" holds the request and status,
+    "<key>.body" the raw response body (the /filter dump can be large).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def save(self, endpoint, query, body, status, content):
+        key = fixture_key(endpoint, query, body)
+        with open(self._path(key, "body"), "wb") as f:
+            f.write(content)
+        with open(self._path(key, "json"), "w") as f:
+            json.dump({"endpoint": endpoint, "query": query or "", "body": (body or b"").decode(), "status": status}, f)
+        return key
+
+    def load(self, key):
+        """(status, body bytes) of a recorded call, or None."""
+        try:
+            with open(self._path(key, "json")) as f:
+                meta = json.load(f)
+            with open(self._path(key, "body"), "rb") as f:
+                return meta["status"], f.read()
+        except FileNotFoundError:
+            return None
+
+    def record_hook(self, response, *args, **kwargs):
+        """requests response hook saving every non-5xx Estaty answer (see EstatyClient)."""
+        if response.status_code >= 500:
+            return response
+        url = urlparse(response.request.url)
+        body = response.request.body
+        if isinstance(body, str):
+            body = body.encode()
+        self.save(url.path.rsplit("/", 1)[-1], url.query, body, response.status_code, response.content)
+        return response
+
+
+class ReplayServer:
+    """
+    Local HTTP stub answering Estaty API calls from a FixtureStore.
+
+    Every call waits `latency` seconds (± `jitter`) and fails with a 503 with
+    probability `error_rate`, to exercise the client's retries. Listing pages
+    past the recorded ones come back empty so walks terminate, other unknown
+    calls get a 404. Image URLs in the bodies point back at the stub, which
+    serves a placeholder PNG, so a replayed import never leaves the machine.
+    """
+
+    def __init__(self, store, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors_injected = 0
+        self.missing = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.base_url = f"{self.url}/api/v1"
+
+    def _rewrite(self, body):
+        def media(match):
+            digest = hashlib.sha1(match.group(0)).hexdigest()[:16]
+            return f"{self.url}/media/{digest}.{match.group(1).decode().lower()}".encode()
+        return MEDIA_URL.sub(media, body)
+
+    def _response(self, endpoint, query, body):
+        key = fixture_key(endpoint, query, body)
+        with self._lock:
+            if key not in self._bodies:
+                recorded = self.store.load(key)
+                self._bodies[key] = recorded and (recorded[0], self._rewrite(recorded[1]))
+            recorded = self._bodies[key]
+            if not recorded:
+                self.missing += 1
+        if recorded:
+            return recorded
+        if endpoint == "getProperties":
+            return 200, b'{"properties": {"data": []}}'
+        log.warning(f"⚠️ No fixture for {endpoint} {query} {body[:200]!r}")
+        return 404, b'{"message": "No recorded response"}'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def delay(self):
+                with server._lock:
+                    server.requests += 1
+                    wait = max(0.0, server.latency + server.random.uniform(-server.jitter, server.jitter))
+                    failing = server.random.random() < server.error_rate
+                    server.errors_injected += failing
+                if wait:
+                    time.sleep(wait)
+                return failing
+
+            def do_GET(self):
+                if self.delay():
+                    return self.reply(503, b"{}")
+                if self.path.startswith("/media/"):
+                    return self.reply(200, PLACEHOLDER_PNG, "image/png")
+                self.reply(404, b"{}")
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.delay():
+                    return self.reply(503, b"{}")
+                self.reply(*server._response(url.path.rsplit("/", 1)[-1], url.query, body))
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
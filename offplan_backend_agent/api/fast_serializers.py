@@ -0,0 +1,188 @@
+"""
+Fast-path serializers for the property list payloads.
+
+They build exactly the JSON of api.serializers.PropertySerializer and
+PropertyBasicSerializer straight from values_list() tuples: the field plan
+is compiled once into (key, getter) pairs, so no model instances or DRF
+field objects are created per row.
+"""
+from operator import itemgetter
+
+from rest_framework import serializers
+
+from api.models import Property, DeveloperCompany
+
+
+def subunit_count_payload(total_subunits):
+    """The {"value", "label"} dict PropertySerializer returns for subunit_count."""
+    if total_subunits <= 1:
+        value = 1
+        label_en = "unit"
+        label_ar = "وحدة"
+        label_fa = "واحد"
+    elif total_subunits > 9:
+        value = "9+"
+        label_en = "units"
+        label_ar = "وحدات"
+        label_fa = "واحدها"
+    else:
+        value = total_subunits
+        label_en = "units"
+        label_ar = "وحدات"
+        label_fa = "واحدها"
+
+    return {
+        "value": value,
+        "label": {
+            "en": label_en,
+            "ar": label_ar,
+            "fa": label_fa,
+        },
+    }
+
+
+class FieldPlan:
+    """Compiled list of (output key, getter(row, request)) pairs over a fixed column tuple."""
+
+    def __init__(self, columns, fields):
+        self.columns = tuple(columns)
+        index = {column: i for i, column in enumerate(self.columns)}
+        self.fields = [(key, build(index)) for key, build in fields]
+
+    def render(self, row, request=None):
+        return {key: getter(row, request) for key, getter in self.fields}
+
+
+def _plain(column):
+    def build(index):
+        get = itemgetter(index[column])
+        return lambda row, request: get(row)
+    return build
+
+
+def _translated(en, ar, fa):
+    def build(index):
+        get = itemgetter(index[en], index[ar], index[fa])
+
+        def getter(row, request):
+            en_value, ar_value, fa_value = get(row)
+            return {"en": en_value or "", "ar": ar_value or "", "fa": fa_value or ""}
+        return getter
+    return build
+
+
+def _file_url(column, storage):
+    def build(index):
+        get = itemgetter(index[column])
+
+        def getter(row, request):
+            name = get(row)
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+        return getter
+    return build
+
+
+def _datetime(column):
+    field = serializers.DateTimeField()
+
+    def build(index):
+        get = itemgetter(index[column])
+
+        def getter(row, request):
+            value = get(row)
+            return field.to_representation(value) if value else None
+        return getter
+    return build
+
+
+def _subunit_count(column):
+    def build(index):
+        get = itemgetter(index[column])
+        return lambda row, request: subunit_count_payload(get(row) or 0)
+    return build
+
+
+def _nested(pk_column, fields):
+    def build(index):
+        get_pk = itemgetter(index[pk_column])
+        compiled = [(key, field_build(index)) for key, field_build in fields]
+
+        def getter(row, request):
+            if get_pk(row) is None:
+                return None
+            return {key: field_getter(row, request) for key, field_getter in compiled}
+        return getter
+    return build
+
+
+PROPERTY_LIST_PLAN = FieldPlan(
+    columns=[
+        "id", "title", "arabic_title", "farsi_title", "cover", "address", "address_text",
+        "delivery_date", "min_area", "low_price",
+        "property_type_id", "property_status_id", "sales_status_id", "updated_at", "unit_count_total",
+        "city_id", "city__name", "city__arabic_city_name", "city__farsi_city_name",
+        "district_id", "district__name", "district__arabic_dist_name", "district__farsi_dist_name",
+        "developer_id", "developer__name", "developer__slug", "developer__user_id", "developer__logo",
+        "developer__website", "developer__email", "developer__phone", "developer__address",
+        "developer__overview",
+    ],
+    fields=[
+        ("id", _plain("id")),
+        ("title", _translated("title", "arabic_title", "farsi_title")),
+        ("cover", _file_url("cover", Property._meta.get_field("cover").storage)),
+        ("address", _plain("address")),
+        ("address_text", _plain("address_text")),
+        ("delivery_date", _plain("delivery_date")),
+        ("min_area", _plain("min_area")),
+        ("low_price", _plain("low_price")),
+        ("property_type", _plain("property_type_id")),
+        ("property_status", _plain("property_status_id")),
+        ("sales_status", _plain("sales_status_id")),
+        ("updated_at", _datetime("updated_at")),
+        ("city", _nested("city_id", [
+            ("id", _plain("city_id")),
+            ("name", _translated("city__name", "city__arabic_city_name", "city__farsi_city_name")),
+        ])),
+        ("district", _nested("district_id", [
+            ("id", _plain("district_id")),
+            ("name", _translated("district__name", "district__arabic_dist_name", "district__farsi_dist_name")),
+        ])),
+        ("developer", _nested("developer_id", [
+            ("id", _plain("developer_id")),
+            ("name", _plain("developer__name")),
+            ("slug", _plain("developer__slug")),
+            ("user_id", _plain("developer__user_id")),
+            ("logo", _file_url("developer__logo", DeveloperCompany._meta.get_field("logo").storage)),
+            ("website", _plain("developer__website")),
+            ("email", _plain("developer__email")),
+            ("phone", _plain("developer__phone")),
+            ("address", _plain("developer__address")),
+            ("overview", _plain("developer__overview")),
+        ])),
+        ("subunit_count", _subunit_count("unit_count_total")),
+    ],
+)
+
+PROPERTY_BASIC_PLAN = FieldPlan(
+    columns=["id", "title"],
+    fields=[
+        ("id", _plain("id")),
+        ("title", _plain("title")),
+    ],
+)
+
+
+def serialize_rows(plan, rows, request=None):
+    """Render values_list(*plan.columns) tuples."""
+    render = plan.render
+    return [render(row, request) for row in rows]
+
+
+def serialize_properties(plan, property_ids, request=None):
+    """Fetch and render the given properties in one query, keeping the order of `property_ids`."""
+    rows = Property.objects.filter(id__in=property_ids).values_list(*plan.columns)
+    by_id = {row[0]: row for row in rows}
+    return serialize_rows(plan, [by_id[pk] for pk in property_ids if pk in by_id], request)
@@ -0,0 +1,178 @@
+import codecs
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Text buffer over a byte stream that is refilled as the parser consumes it."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.buffer = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        if self.exhausted:
+            return False
+        # Drop what was consumed so the buffer stays about one item long
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        try:
+            self.buffer += self.decode(next(self.chunks))
+        except StopIteration:
+            self.buffer += self.decode(b"", final=True)
+            self.exhausted = True
+        return True
+
+    def peek(self):
+        """Next non-whitespace character (not consumed), or "" at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the /filter response")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input until it fits."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number or literal touching the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+
+def iter_json_array(chunks, key="properties"):
+    """
+    Yield the items of the top-level `key` array of a JSON object read from
+    `chunks` (an iterable of bytes), one at a time. Only the current item is
+    held in memory; other top-level members are parsed and dropped.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                        continue
+                    reader.expect("]")
+                    break
+        else:
+            reader.value()
+
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def _file_chunks(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_SIZE):
+            yield chunk
+
+
+class FilterDump:
+    """
+    The full /filter response downloaded once to a temp file and re-read by
+    every stage of an import run.
+    """
+
+    def __init__(self, client, directory=None):
+        self.client = client
+        self.directory = directory
+        self.path = None
+        self._lock = threading.Lock()
+
+    def download(self):
+        with self._lock:
+            if self.path:
+                return self.path
+            fd, path = tempfile.mkstemp(prefix="estaty-filter-", suffix=".json", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f, self.client.stream("filter") as response:
+                    for chunk in response.iter_content(READ_SIZE):
+                        f.write(chunk)
+            except Exception:
+                os.unlink(path)
+                raise
+            log.info(f"📥 Cached /filter response ({os.path.getsize(path)} bytes) at {path}")
+            self.path = path
+            return path
+
+    def iter_properties(self):
+        return iter_json_array(_file_chunks(self.download()))
+
+    def discard(self):
+        with self._lock:
+            if self.path and os.path.exists(self.path):
+                os.unlink(self.path)
+            self.path = None
+
+
+_current_dump = None
+
+
+@contextmanager
+def filter_cache(client, directory=None):
+    """
+    Share one /filter download between every iter_filter_properties() call
+    made inside the block (including nested call_command stages); the file
+    is removed on exit.
+    """
+    global _current_dump
+    previous, _current_dump = _current_dump, FilterDump(client, directory)
+    try:
+        yield _current_dump
+    finally:
+        _current_dump.discard()
+        _current_dump = previous
+
+
+def iter_filter_properties(client):
+    """
+    Yield the properties of an empty /filter query one at a time, with their
+    apartments. Inside filter_cache() the run's cached download is used,
+    otherwise the response is parsed as it streams in.
+    """
+    if _current_dump is not None:
+        yield from _current_dump.iter_properties()
+        return
+    with client.stream("filter") as response:
+        yield from iter_json_array(response.iter_content(READ_SIZE))
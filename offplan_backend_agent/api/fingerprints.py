@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+from api.models import PropertyFingerprint
+
+# section -> payload keys hashed into it; "base" takes every other key
+SECTION_KEYS = {
+    "units": ["grouped_apartments"],
+    "images": ["cover", "property_images"],
+    "plans": ["payment_plans"],
+    "facilities": ["property_facilities"],
+}
+SECTIONS = ["base", *SECTION_KEYS]
+
+FINGERPRINT_FIELDS = ["payload_hash"] + [f"{section}_hash" for section in SECTIONS]
+
+
+def _digest(value):
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _image_name(url):
+    # Image URLs can carry signed or cache-busting query strings; only the file matters
+    return os.path.basename(url.split("?")[0]) if url else None
+
+
+def _normalize(section, values):
+    if section == "images":
+        return {
+            "cover": _image_name(values.get("cover")),
+            "property_images": sorted(
+                (_image_name(img.get("image")), img.get("type", 2))
+                for img in values.get("property_images") or []
+                if img.get("image")
+            ),
+        }
+    if section == "facilities":
+        return sorted(
+            (f.get("facility") or {}).get("id") or 0
+            for f in values.get("property_facilities") or []
+        )
+    return values
+
+
+def fingerprint_payload(data):
+    """Return {section: sha256} for a /getProperty payload, plus "payload" over all sections."""
+    section_keys = {key for keys in SECTION_KEYS.values() for key in keys}
+    parts = {"base": {key: value for key, value in data.items() if key not in section_keys}}
+    for section, keys in SECTION_KEYS.items():
+        parts[section] = {key: data.get(key) for key in keys}
+
+    hashes = {section: _digest(_normalize(section, parts[section])) for section in SECTIONS}
+    hashes["payload"] = _digest([hashes[section] for section in SECTIONS])
+    return hashes
+
+
+def stored_fingerprints(property_ids):
+    """{property_id: {section: hash}} for the properties that have a fingerprint."""
+    rows = PropertyFingerprint.objects.filter(property_id__in=property_ids).values("property_id", *FINGERPRINT_FIELDS)
+    return {
+        row["property_id"]: {field[:-len("_hash")]: row[field] for field in FINGERPRINT_FIELDS}
+        for row in rows
+    }
+
+
+def changed_sections(hashes, stored):
+    """Sections whose hash differs from the stored fingerprint (all of them when there is none)."""
+    if stored is None:
+        return set(SECTIONS)
+    if stored["payload"] == hashes["payload"]:
+        return set()
+    return {section for section in SECTIONS if stored[section] != hashes[section]}
+
+
+def held_back(hashes, stored, section):
+    """`hashes` with `section` kept at its stored value, so it still reads as changed until saved for real."""
+    held = dict(hashes)
+    held[section] = stored[section] if stored else ""
+    held["payload"] = _digest([held[name] for name in SECTIONS])
+    return held
+
+
+def save_fingerprints(hashes_by_id):
+    PropertyFingerprint.objects.bulk_create(
+        [
+            PropertyFingerprint(property_id=prop_id, **{f"{section}_hash": value for section, value in hashes.items()})
+            for prop_id, hashes in hashes_by_id.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["property"],
+        update_fields=FINGERPRINT_FIELDS + ["updated_at"],
+    )
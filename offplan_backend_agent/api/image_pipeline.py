@@ -0,0 +1,266 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.timezone import now
+
+from api.models import Property, PropertyImage, DeveloperCompany, RemoteImage
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = (5, 30)
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024  # larger downloads spill to a temp file instead of memory
+
+COVER_DIR = Property._meta.get_field("cover").upload_to
+GALLERY_DIR = PropertyImage._meta.get_field("image").upload_to
+LOGO_DIR = DeveloperCompany._meta.get_field("logo").upload_to
+
+# What a fetched image is attached to once stored
+Cover = namedtuple("Cover", "property_id")
+GalleryImage = namedtuple("GalleryImage", "property_id type")
+Logo = namedtuple("Logo", "developer_id")
+
+FetchResult = namedtuple("FetchResult", "url etag last_modified content_hash storage_name")
+
+
+def url_file_name(url):
+    return os.path.basename(url.split("?")[0]) if url else ""
+
+
+def url_hash(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def already_stored(stored_name, url, known):
+    """
+    True when `stored_name` already holds the image at `url`: either the
+    content-addressed file fetched for it before, or a file saved under the
+    URL's own name by the older importers.
+    """
+    if not stored_name or not url:
+        return False
+    return stored_name == known.get(url) or os.path.basename(stored_name) == url_file_name(url)
+
+
+class ImagePipeline:
+    """
+    Import-wide image fetcher shared by covers, galleries and developer logos.
+
+    Downloads run on one worker pool over one keep-alive session. Known URLs
+    are re-requested conditionally (If-None-Match / If-Modified-Since), so an
+    unchanged image costs a 304. Bodies are streamed through a spooled temp
+    file while being hashed and stored under "<upload_to><sha256><ext>", so
+    identical bytes are uploaded once whatever URL they came from.
+
+    Workers never touch the database: add() looks up the known validators
+    up front and apply() attaches finished images to their rows in bulk from
+    the calling thread.
+
+    Jobs added with a `group` (a property id) are tracked together:
+    `on_stored(groups)` is called from apply() with the groups whose images
+    were all stored and attached, so callers can record them as done. A group
+    with a failed download is never reported.
+
+    `requests_made` and `bytes_downloaded` count the image requests sent and
+    the body bytes received.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, storage=None, on_stored=None):
+        self.timeout = timeout
+        self.storage = storage or default_storage
+        self.on_stored = on_stored
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="images")
+        self.pending = []  # (future, target, group)
+        self._groups = {}  # group -> [downloads still running, all succeeded so far]
+        self._completed_groups = []
+        self._stored = set()
+        self._stored_lock = threading.Lock()
+        self.requests_made = 0
+        self.bytes_downloaded = 0
+        self._stats_lock = threading.Lock()
+
+        adapter = HTTPAdapter(
+            pool_maxsize=concurrency,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504)),
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def add(self, jobs, group=None):
+        """Queue [(url, upload_to, target), ...] for download, optionally as part of `group`."""
+        jobs = [job for job in jobs if job[0]]
+        if group is not None:
+            if jobs:
+                entry = self._groups.setdefault(group, [0, True])
+                entry[0] += len(jobs)
+            elif group not in self._groups:
+                # Nothing to download: the group's images are already in place
+                self._completed_groups.append(group)
+        if not jobs:
+            return
+        known = {
+            row.url_hash: row
+            for row in RemoteImage.objects.filter(url_hash__in=[url_hash(url) for url, _, _ in jobs])
+        }
+        for url, upload_to, target in jobs:
+            future = self.executor.submit(self._fetch, url, upload_to, known.get(url_hash(url)))
+            self.pending.append((future, target, group))
+
+    def known_names(self, urls):
+        """{url: stored file name} for URLs fetched by earlier runs."""
+        rows = RemoteImage.objects.filter(url_hash__in=[url_hash(url) for url in urls if url])
+        by_hash = {row.url_hash: row.storage_name for row in rows}
+        return {url: by_hash[url_hash(url)] for url in urls if url and url_hash(url) in by_hash}
+
+    # --------------- WORKERS -----------------------
+
+    def _fetch(self, url, upload_to, known):
+        headers = {}
+        if known:
+            if known.etag:
+                headers["If-None-Match"] = known.etag
+            if known.last_modified:
+                headers["If-Modified-Since"] = known.last_modified
+
+        with self._stats_lock:
+            self.requests_made += 1
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and known:
+                    return FetchResult(url, known.etag, known.last_modified, known.content_hash, known.storage_name)
+                response.raise_for_status()
+
+                digest = hashlib.sha256()
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as body:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        body.write(chunk)
+                    with self._stats_lock:
+                        self.bytes_downloaded += body.tell()
+                    content_hash = digest.hexdigest()
+                    extension = os.path.splitext(url_file_name(url))[1].lower()
+                    storage_name = self._store(body, f"{upload_to}{content_hash}{extension}")
+
+                return FetchResult(
+                    url,
+                    response.headers.get("ETag", ""),
+                    response.headers.get("Last-Modified", ""),
+                    content_hash,
+                    storage_name,
+                )
+        except Exception as e:
+            log.warning(f"⚠️ Could not download image from {url}: {e}")
+            return None
+
+    def _store(self, body, name):
+        with self._stored_lock:
+            if name in self._stored:
+                return name
+            self._stored.add(name)
+        try:
+            if not self.storage.exists(name):
+                body.seek(0)
+                name = self.storage.save(name, File(body, name=os.path.basename(name)))
+        except Exception:
+            with self._stored_lock:
+                self._stored.discard(name)
+            raise
+        return name
+
+    # --------------- ATTACHING RESULTS -----------------------
+
+    def apply(self, wait=False):
+        """Attach finished downloads to their rows; with `wait`, wait for all queued ones first."""
+        finished, still_pending = [], []
+        for future, target, group in self.pending:
+            if wait or future.done():
+                result = future.result()
+                finished.append((result, target))
+                self._settle(group, result is not None)
+            else:
+                still_pending.append((future, target, group))
+        self.pending = still_pending
+
+        applied = self._attach([(result, target) for result, target in finished if result])
+        completed, self._completed_groups = self._completed_groups, []
+        if completed and self.on_stored:
+            self.on_stored(completed)
+        return applied
+
+    def _settle(self, group, succeeded):
+        if group is None:
+            return
+        entry = self._groups[group]
+        entry[0] -= 1
+        entry[1] = entry[1] and succeeded
+        if entry[0] == 0:
+            del self._groups[group]
+            if entry[1]:
+                self._completed_groups.append(group)
+            else:
+                log.warning(f"⚠️ Some images of {group} failed; they will be retried on the next import")
+
+    def _attach(self, finished):
+        if not finished:
+            return 0
+
+        RemoteImage.objects.bulk_create(
+            [
+                RemoteImage(
+                    url=result.url, url_hash=url_hash(result.url), etag=result.etag,
+                    last_modified=result.last_modified, content_hash=result.content_hash,
+                    storage_name=result.storage_name,
+                )
+                for result in {result.url: result for result, _ in finished}.values()
+            ],
+            update_conflicts=True,
+            unique_fields=["url_hash"],
+            update_fields=["etag", "last_modified", "content_hash", "storage_name", "fetched_at"],
+        )
+
+        covers = {target.property_id: result.storage_name for result, target in finished if isinstance(target, Cover)}
+        if covers:
+            Property.objects.bulk_update([Property(id=pk, cover=name) for pk, name in covers.items()], ["cover"])
+
+        logos = {target.developer_id: result.storage_name for result, target in finished if isinstance(target, Logo)}
+        if logos:
+            DeveloperCompany.objects.bulk_update([DeveloperCompany(id=pk, logo=name) for pk, name in logos.items()], ["logo"])
+
+        gallery = [(result, target) for result, target in finished if isinstance(target, GalleryImage)]
+        if gallery:
+            existing = set(
+                PropertyImage.objects.filter(property_id__in={target.property_id for _, target in gallery})
+                .values_list("property_id", "image")
+            )
+            created_at = now()
+            images = []
+            for result, target in gallery:
+                key = (target.property_id, result.storage_name)
+                if key in existing:
+                    continue
+                existing.add(key)
+                images.append(PropertyImage(
+                    property_id=target.property_id, type=target.type,
+                    image=result.storage_name, created_at=created_at,
+                ))
+            PropertyImage.objects.bulk_create(images)
+
+        return len(finished)
+
+    def close(self):
+        applied = self.apply(wait=True)
+        self.executor.shutdown()
+        self.session.close()
+        return applied
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.utils.timezone import now
+
+from api.models import ImportRun
+
+log = logging.getLogger(__name__)
+
+SAVE_INTERVAL = 5.0  # seconds between checkpoint writes
+
+COUNTERS = [
+    "pages_fetched", "properties_fetched", "properties_written",
+    "properties_skipped", "requests", "bytes_downloaded",
+]
+
+
+class ImportCheckpoint:
+    """
+    Tracks which listing pages and properties of an ImportRun are committed.
+
+    A property is committed once the writer has flushed it (written or
+    skipped as unchanged) or rejected it as invalid; a failed detail fetch
+    leaves it open. A page is committed once every property listed on it is,
+    and `last_completed_page` only advances over a contiguous run of
+    committed pages, so a resumed run restarts the listing right after it and
+    skips the properties already committed on the pages that follow.
+
+    page_listed() is called from the listing thread, the rest from the
+    importing thread.
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self.listed = set(run.listed_ids)
+        self.completed = set(run.completed_ids)
+        self.open_pages = {}  # page -> ids listed there and not committed yet
+        self.pages_of = defaultdict(set)
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+
+    @classmethod
+    def start(cls, resume=False):
+        """Create the ImportRun of this import, continuing the last one if it did not complete."""
+        previous = ImportRun.objects.order_by("-started_at").first() if resume else None
+        if previous is None or previous.status == "completed":
+            if resume:
+                log.info("ℹ️ No unfinished import run to resume, starting a new one")
+            return cls(ImportRun.objects.create())
+
+        if previous.status == "running":
+            # The process died without recording it
+            previous.status = "failed"
+            previous.error = previous.error or "Interrupted"
+            previous.save(update_fields=["status", "error"])
+        log.info(f"⏯ Resuming import run {previous.id} after page {previous.last_completed_page}")
+        return cls(ImportRun.objects.create(
+            resumed_from=previous,
+            last_completed_page=previous.last_completed_page,
+            listed_ids=previous.listed_ids,
+            completed_ids=previous.completed_ids,
+        ))
+
+    @property
+    def start_page(self):
+        return self.run.last_completed_page + 1
+
+    def is_committed(self, prop_id):
+        return prop_id in self.completed
+
+    def page_listed(self, page, prop_ids):
+        with self._lock:
+            self.listed.update(prop_ids)
+            pending = set(prop_ids) - self.completed
+            self.open_pages[page] = pending
+            for prop_id in pending:
+                self.pages_of[prop_id].add(page)
+            self.run.pages_fetched += 1
+            self._advance()
+
+    def commit(self, prop_ids):
+        with self._lock:
+            self.completed.update(prop_ids)
+            for prop_id in prop_ids:
+                for page in self.pages_of.pop(prop_id, ()):
+                    self.open_pages[page].discard(prop_id)
+            self._advance()
+
+    def _advance(self):
+        page = self.run.last_completed_page + 1
+        while page in self.open_pages and not self.open_pages[page]:
+            del self.open_pages[page]
+            self.run.last_completed_page = page
+            page += 1
+
+    def save(self, force=False, **counters):
+        """Update the run's counters and, at most every SAVE_INTERVAL seconds, persist the checkpoint."""
+        for name, value in counters.items():
+            setattr(self.run, name, value)
+        if force or time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self._persist()
+
+    def _persist(self, *extra_fields):
+        # Under the lock: the listing thread moves the page counters too
+        with self._lock:
+            self.run.listed_ids = sorted(self.listed)
+            self.run.completed_ids = sorted(self.completed)
+            self.run.checkpoint_at = now()
+            self.run.save(update_fields=[
+                "last_completed_page", "listed_ids", "completed_ids", "checkpoint_at", *COUNTERS, *extra_fields,
+            ])
+        self._saved_at = time.monotonic()
+
+    def finish(self, status, error=""):
+        self.run.status = status
+        self.run.error = error
+        self.run.finished_at = now()
+        self._persist("status", "error", "finished_at")
+
+    def summary(self):
+        run = self.run
+        return (
+            f"Run {run.id}: {run.properties_fetched} properties in {run.elapsed_seconds:.0f}s "
+            f"({run.properties_per_second:.1f}/s), {run.requests} requests ({run.requests_per_second:.1f}/s), "
+            f"{run.bytes_downloaded / (1024 * 1024):.1f} MB downloaded"
+        )
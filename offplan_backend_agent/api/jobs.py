@@ -0,0 +1,135 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from api.models import BackgroundJob
+
+log = logging.getLogger(__name__)
+
+HANDLERS = {}
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+# A running job not finished after this long belongs to a dead worker
+LOCK_TIMEOUT = timedelta(minutes=15)
+# How often a worker refreshes locked_at on the job it is running
+HEARTBEAT_INTERVAL = LOCK_TIMEOUT / 5
+
+
+def job(kind):
+    """Register the decorated function as the handler of `kind` jobs; it receives the BackgroundJob."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, max_attempts=5, **payload):
+    """
+    Queue a `kind` job. Called inside a transaction (e.g. a model save) the
+    job only becomes visible to workers once that transaction commits.
+    """
+    return BackgroundJob.objects.create(kind=kind, payload=payload, max_attempts=max_attempts)
+
+
+def claim(limit):
+    """Lock up to `limit` due jobs for this worker; concurrent workers skip each other's rows."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            BackgroundJob.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", run_after__lte=now)
+            .order_by("run_after", "id")[:limit]
+        )
+        for queued in jobs:
+            queued.status = "running"
+            queued.locked_at = now
+            queued.attempts += 1
+        BackgroundJob.objects.bulk_update(jobs, ["status", "locked_at", "attempts"])
+    return jobs
+
+
+def requeue_stale():
+    """Hand jobs left running by a crashed worker back to the queue."""
+    count = BackgroundJob.objects.filter(
+        status="running", locked_at__lt=timezone.now() - LOCK_TIMEOUT,
+    ).update(status="pending", locked_at=None)
+    if count:
+        log.warning(f"⚠️ Requeued {count} jobs abandoned by a worker")
+    return count
+
+
+class Heartbeat(threading.Thread):
+    """
+    Keeps refreshing locked_at on a running job so requeue_stale() leaves it
+    alone however long it runs. `locked_at` is the value currently held; it
+    is None once another worker has requeued the job.
+    """
+
+    def __init__(self, queued, interval=HEARTBEAT_INTERVAL):
+        super().__init__(name=f"job-{queued.pk}-heartbeat", daemon=True)
+        self.pk = queued.pk
+        self.locked_at = queued.locked_at
+        self.interval = interval.total_seconds()
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while self.locked_at and not self._stopped.wait(self.interval):
+                beat = timezone.now()
+                if BackgroundJob.objects.filter(pk=self.pk, locked_at=self.locked_at).update(locked_at=beat):
+                    self.locked_at = beat
+                else:
+                    self.locked_at = None
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        return self.locked_at
+
+
+def run(queued):
+    """
+    Run one claimed job and record the outcome; failures are retried with
+    exponential backoff. The outcome is only written while this worker still
+    holds the job: one requeued as stale and claimed elsewhere is left alone.
+    """
+    close_old_connections()
+    heartbeat = Heartbeat(queued)
+    heartbeat.start()
+    try:
+        handler = HANDLERS.get(queued.kind)
+        if handler is None:
+            raise LookupError(f"No handler registered for {queued.kind!r}")
+        handler(queued)
+    except Exception as e:
+        queued.error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        queued.locked_at = None
+        if queued.is_last_attempt:
+            queued.status = "failed"
+            queued.finished_at = timezone.now()
+            log.error(f"❌ {queued} gave up after {queued.attempts} attempts: {queued.error}")
+        else:
+            queued.status = "pending"
+            delay = min(RETRY_BASE_SECONDS * 2 ** (queued.attempts - 1), RETRY_MAX_SECONDS)
+            queued.run_after = timezone.now() + timedelta(seconds=delay)
+            log.warning(f"⚠️ {queued} failed (attempt {queued.attempts}), retrying in {delay}s: {queued.error}")
+    else:
+        queued.status = "done"
+        queued.error = ""
+        queued.locked_at = None
+        queued.finished_at = timezone.now()
+    locked_at = heartbeat.stop()
+    saved = locked_at and BackgroundJob.objects.filter(pk=queued.pk, locked_at=locked_at).update(
+        **{field: getattr(queued, field) for field in ("status", "error", "locked_at", "run_after", "finished_at")}
+    )
+    close_old_connections()
+    if not saved:
+        log.warning(f"⚠️ {queued} was requeued while running; dropping this worker's outcome")
+        return "lost"
+    return queued.status
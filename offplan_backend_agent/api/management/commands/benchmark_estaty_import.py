@@ -0,0 +1,110 @@
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.test.utils import override_settings
+
+from api.estaty_replay import FixtureStore, ReplayServer
+from api.models import Property
+
+
+@contextmanager
+def environ(**values):
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class Command(BaseCommand):
+    help = "Time the Estaty import commands end to end on a throwaway test database, against recorded API fixtures"
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", help="Directory of recorded Estaty responses")
+        parser.add_argument("--record", action="store_true", help="Run against the live API and save its responses to the fixtures directory")
+        parser.add_argument("--latency", type=float, default=50, help="Replay latency per request, in ms")
+        parser.add_argument("--jitter", type=float, default=0, help="Random ± latency per request, in ms")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share of replayed requests answered with a 503")
+        parser.add_argument("--seed", type=int, default=1, help="Seed for jitter and injected errors")
+        parser.add_argument("--stale", type=int, default=20, help="Properties made to look outdated before the delta sync step")
+        parser.add_argument("--keepdb", action="store_true", help="Keep the test database between benchmark runs")
+
+    def handle(self, *args, **options):
+        store = FixtureStore(options["fixtures"])
+        self.verbose = options["verbosity"] > 1
+        server = None
+        if options["record"]:
+            env = {"ESTATY_RECORD_DIR": store.directory}
+            self.stdout.write(f"🎙 Recording live Estaty responses into {store.directory}")
+        else:
+            server = ReplayServer(
+                store, latency=options["latency"] / 1000, jitter=options["jitter"] / 1000,
+                error_rate=options["error_rate"], seed=options["seed"],
+            ).start()
+            env = {"ESTATY_BASE_URL": server.base_url}
+            self.stdout.write(f"▶️ Replaying {store.directory} from {server.base_url} "
+                              f"({options['latency']:.0f}±{options['jitter']:.0f} ms, {options['error_rate']:.0%} errors)")
+
+        steps = [
+            ("full import (empty DB)", lambda: call_command("import_estaty_properties", **self.quiet())),
+            ("full import (unchanged)", lambda: call_command("import_estaty_properties", **self.quiet())),
+            ("unit import", lambda: call_command("import_property_unit", **self.quiet())),
+            ("delta sync", lambda: self.delta_sync(options["stale"])),
+        ]
+
+        results = []
+        with environ(**env), tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+            try:
+                for name, step in steps:
+                    results.append(self.run_step(name, step, server))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+                if server:
+                    server.stop()
+
+        self.stdout.write(f"\n📊 {'step':<26}{'seconds':>10}{'requests':>10}  result")
+        for name, seconds, requests, error in results:
+            self.stdout.write(f"   {name:<26}{seconds:>10.2f}{requests:>10}  {error or 'ok'}")
+        if server:
+            self.stdout.write(f"   {server.errors_injected} errors injected, {server.missing} calls without a fixture")
+
+    def quiet(self):
+        if self.verbose:
+            return {}
+        sink = io.StringIO()
+        return {"stdout": sink, "stderr": sink}
+
+    def run_step(self, name, step, server):
+        self.stdout.write(f"⏱ {name}...")
+        requests_before = server.requests if server else 0
+        error = None
+        start = time.perf_counter()
+        try:
+            # The import commands also print() progress lines
+            with nullcontext() if self.verbose else redirect_stdout(io.StringIO()):
+                step()
+        except Exception as e:
+            error = f"failed: {e}"
+        seconds = time.perf_counter() - start
+        requests = server.requests - requests_before if server else 0
+        return name, seconds, requests, error
+
+    def delta_sync(self, stale):
+        # Push the newest properties back a day so the delta sync has work to do
+        ids = list(Property.objects.order_by("-updated_at").values_list("id", flat=True)[:stale])
+        Property.objects.filter(id__in=ids).update(updated_at=F("updated_at") - timedelta(days=1))
+        call_command("incremental_estaty_check", **self.quiet())
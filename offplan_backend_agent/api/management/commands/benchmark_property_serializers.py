@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from api.models import Property
+from api.serializers import PropertySerializer
+from api.query_plan import apply_query_plan
+from api.fast_serializers import PROPERTY_LIST_PLAN, serialize_properties
+
+
+class Command(BaseCommand):
+    help = "Compare PropertySerializer with the fast-path list serializer on real rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=250, help="Number of properties per run")
+        parser.add_argument("--repeat", type=int, default=20, help="Number of runs per serializer")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        request = APIRequestFactory().get("/api/properties/")
+        ids = list(Property.objects.order_by("-updated_at").values_list("id", flat=True)[:rows])
+        if not ids:
+            self.stdout.write(self.style.WARNING("⚠️ No properties to benchmark."))
+            return
+
+        def drf():
+            properties = apply_query_plan(Property.objects.filter(id__in=ids), PropertySerializer)
+            return PropertySerializer(properties, many=True, context={"request": request}).data
+
+        def fast():
+            return serialize_properties(PROPERTY_LIST_PLAN, ids, request)
+
+        self.stdout.write(f"📊 {len(ids)} properties, {repeat} runs each (query + serialization)")
+        timings = {}
+        for name, func in (("PropertySerializer", drf), ("fast path", fast)):
+            func()  # warm up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            timings[name] = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(f"  {name:<20} {timings[name]:8.2f} ms/run")
+
+        speedup = timings["PropertySerializer"] / timings["fast path"] if timings["fast path"] else 0
+        self.stdout.write(self.style.SUCCESS(f"✅ Fast path is {speedup:.1f}x faster"))
@@ -1,10 +1,14 @@
 import json
 import logging
-import requests
 from dateutil import parser as date_parser
 from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.utils.timezone import is_naive, make_aware
 from api.models import Property, PropertyUnit
-import os
+from api.data_versions import PROPERTY_DATA, bump_version
+from api.unit_rollups import refresh_unit_rollups
+from api.estaty_client import EstatyClient
+from api.filter_stream import iter_filter_properties
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,134 +16,180 @@ load_dotenv()
 # Set up logging
 log = logging.getLogger(__name__)
 
-# API endpoints and headers
-API_KEY = os.getenv("ESTATY_API_KEY")
-GET_PROPERTIES_URL = "https://panel.estaty.app/api/v1/getProperties"
-FILTER_URL = "https://panel.estaty.app/api/v1/filter"
-HEADERS = {
-    "App-key": API_KEY,
-    "Content-Type": "application/json",
-}
+# Properties whose units are diffed and written per transaction
+BATCH_SIZE = 200
+
+UNIT_FIELDS = [
+    "property_id", "apartment_id", "apartment_type_id", "status", "area", "price",
+    "apt_no", "floor_plan_image", "unit_image", "created_at", "updated_at",
+]
+
+
+def parse_floor_plan_image(unit_id, floor_plan_raw):
+    """Safely parse and clean the floor_plan_image JSON field to the first image URL"""
+    if not floor_plan_raw:
+        return ""
+    try:
+        parsed_images = json.loads(floor_plan_raw)
+        if isinstance(parsed_images, list) and parsed_images:
+            # Clean and normalize the first image URL
+            return parsed_images[0].replace("\\/", "/")
+    except (json.JSONDecodeError, TypeError):
+        log.warning(f"⚠️ Invalid JSON for unit {unit_id} floor_plan_image, using empty string.")
+    return ""
+
+
+def normalize_unit(unit):
+    """
+    Coerce the raw API values on `unit` to what the database hands back
+    (numbers from strings, aware datetimes...), so save_units() compares like
+    with like and only genuinely changed units are rewritten.
+    """
+    for name in UNIT_FIELDS:
+        field = PropertyUnit._meta.get_field(name)
+        value = field.to_python(getattr(unit, name))
+        if isinstance(field, models.DateTimeField) and value is not None and is_naive(value):
+            value = make_aware(value)
+        setattr(unit, field.attname, value)
+    return unit
+
+
+def build_unit(property_id, unit_data):
+    unit_id = unit_data.get("id")
+    return normalize_unit(PropertyUnit(
+        id=unit_id,
+        property_id=property_id,
+        apartment_id=unit_data.get("apartment_id"),
+        apartment_type_id=unit_data.get("apartment_type_id"),
+        status=unit_data.get("status") or "Unknown",
+        area=unit_data.get("area") or 0,
+        price=unit_data.get("price") or 0,
+        apt_no=unit_data.get("apt_no"),
+        floor_plan_image=parse_floor_plan_image(unit_id, unit_data.get("floor_plan_image")),
+        unit_image=unit_data.get("unit_image"),
+        created_at=date_parser.parse(unit_data["created_at"]),
+        updated_at=date_parser.parse(unit_data["updated_at"]),
+    ))
 
 
 class Command(BaseCommand):
-    help = "Import Property Units from Estaty API using /getProperties and /filter"
+    help = "Import Property Units from the Estaty /filter catalogue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Only import units of these property IDs")
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("🚀 Starting property unit import..."))
-        all_properties = self.fetch_all_properties()
-        page=1
-        total_saved = 0
+        self.client = EstatyClient()
+        self.stats = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        updated_property_ids = []
+        batch = {}
 
-        for prop in all_properties:
-            title = prop.get("title")
-            if not title:
+        for prop_id, apartment_list in self.iter_apartments(options["ids"]):
+            if not apartment_list:
                 continue
-
-            self.stdout.write(f"🔍 Fetching details for '{title}'")
-
-            property_data = self.fetch_property_details_by_title(title)
-            if not property_data:
-                self.stdout.write(self.style.WARNING(f"⚠️ No data found for '{title}'"))
-                continue
-
+            batch[prop_id] = apartment_list
+            if len(batch) >= BATCH_SIZE:
+                updated_property_ids += self.save_units(batch)
+                batch = {}
+        updated_property_ids += self.save_units(batch)
+
+        refresh_unit_rollups(updated_property_ids)
+        bump_version(PROPERTY_DATA)
+        self.stdout.write(self.style.SUCCESS(
+            f"🏁 Done! PropertyUnits created: {self.stats['created']}, updated: {self.stats['updated']}, "
+            f"unchanged: {self.stats['unchanged']}, deleted: {self.stats['deleted']}"
+        ))
+
+    def iter_apartments(self, property_ids):
+        """Yield (property id, apartment list) for the local properties to import."""
+        if property_ids:
+            # A handful of properties (delta sync): look each one up by title
+            for prop_id, title in Property.objects.filter(id__in=property_ids).values_list("id", "title"):
+                property_data = self.fetch_property_details_by_title(title)
+                if property_data and property_data.get("id") == prop_id:
+                    yield prop_id, property_data.get("apartment") or []
+                else:
+                    self.stdout.write(self.style.WARNING(f"⚠️ No data found for '{title}'"))
+            return
+
+        # Whole catalogue: one pass over the /filter dump, indexed by property id
+        local_ids = set(Property.objects.values_list("id", flat=True))
+        for property_data in iter_filter_properties(self.client):
             prop_id = property_data.get("id")
-            try:
-                property_instance = Property.objects.get(id=prop_id)
-            except Property.DoesNotExist:
-                self.stdout.write(self.style.WARNING(f"⚠️ Property ID {prop_id} not found in DB."))
-                continue
-
-            apartment_list = property_data.get("apartment", [])
-            if apartment_list:
-                saved_count = self.save_apartments(property_instance, apartment_list)
-                total_saved += saved_count
-                self.stdout.write(self.style.SUCCESS(f"✅ Saved {saved_count} units for '{title}'"))
-            else:
-                self.stdout.write(self.style.WARNING(f"⚠️ No apartments found for '{title}'"))
-        page += 1
-        self.stdout.write(self.style.SUCCESS(f"🏁 Done! Total PropertyUnits imported: {total_saved}"))
-
-    def fetch_all_properties(self):
-        all_properties = []
-        url = GET_PROPERTIES_URL
-
-        while url:
-            try:
-                response = requests.post(url, headers=HEADERS)
-                response.raise_for_status()
-                data = response.json()
-
-                page_properties = data.get("properties", {}).get("data", [])
-                all_properties.extend(page_properties)
-
-                url = data.get("properties", {}).get("next_page_url")
-                self.stdout.write(self.style.NOTICE(f"📄 Fetched {len(page_properties)} properties, next page: {url}"))
-
-            except requests.RequestException as e:
-                log.error(f"❌ Failed to fetch properties from {url}: {e}")
-                break  # Stop fetching if a request fails
-
-        return all_properties
+            if prop_id in local_ids:
+                yield prop_id, property_data.get("apartment") or []
 
     def fetch_property_details_by_title(self, title):
         try:
-            response = requests.post(FILTER_URL, headers=HEADERS, json={"property_name": title})
-            response.raise_for_status()
-            data = response.json()
+            data = self.client.post("filter", {"property_name": title})
             return data.get("properties", [])[0] if data.get("properties") else None
-
-        except requests.HTTPError as e:
-            if response.status_code == 500:
-                log.warning(f"⚠️ Skipping '{title}' due to 500 Internal Server Error.")
-            else:
-                log.error(f"❌ HTTPError for '{title}': {e}")
+        except Exception as e:
+            log.error(f"❌ /filter lookup failed for '{title}': {e}")
             return None
 
-        except requests.RequestException as e:
-            log.error(f"❌ RequestException for '{title}': {e}")
-            return None
-
-    def save_apartments(self, property_instance, apartment_list):
-        saved = 0
-        for unit_data in apartment_list:
-            unit_id = unit_data.get("id")
-            if not unit_id:
-                continue
-
-            # Safely parse and clean floor_plan_image JSON field
-            floor_plan_raw = unit_data.get("floor_plan_image")
-            floor_plan_image = ""
-            if floor_plan_raw:
+    def save_units(self, apartments_by_property):
+        """
+        Diff the incoming units of a batch of properties against the stored ones:
+        new and changed units are upserted in one statement, units no longer
+        listed for their property are deleted in another, unchanged ones are
+        left alone. Returns the ids of the properties whose units changed.
+        """
+        if not apartments_by_property:
+            return []
+
+        incoming = {}
+        listed = set()
+        for prop_id, apartment_list in apartments_by_property.items():
+            for unit_data in apartment_list:
+                if not unit_data.get("id"):
+                    continue
+                listed.add(unit_data["id"])
                 try:
-                    parsed_images = json.loads(floor_plan_raw)
-                    if isinstance(parsed_images, list) and parsed_images:
-                        # Clean and normalize the first image URL
-                        floor_plan_image = parsed_images[0].replace("\\/", "/")
-                except json.JSONDecodeError:
-                    floor_plan_image = ""
-                    log.warning(f"⚠️ Invalid JSON for unit {unit_id} floor_plan_image, using empty string.")
-
-            try:
-                unit, created = PropertyUnit.objects.update_or_create(
-                    id=unit_id,
-                    defaults={
-                        "property": property_instance,
-                        "apartment_id": unit_data.get("apartment_id"),
-                        "apartment_type_id": unit_data.get("apartment_type_id"),
-                        "status": unit_data.get("status") or "Unknown",
-                        "area": unit_data.get("area") or 0,
-                        "price": unit_data.get("price") or 0,
-                        "apt_no": unit_data.get("apt_no"),
-                        "floor_plan_image": floor_plan_image,
-                        "unit_image": unit_data.get("unit_image"),
-                        "created_at": date_parser.parse(unit_data["created_at"]),
-                        "updated_at": date_parser.parse(unit_data["updated_at"]),
-                    }
-                )
-                saved += 1
-            except Exception as e:
-                log.error(f"❌ Failed to save unit {unit_id}: {str(e)}")
-
-        log.info(f"✅ Saved {saved} apartment units.")        
-        return saved
+                    incoming[unit_data["id"]] = build_unit(prop_id, unit_data)
+                except Exception as e:
+                    log.error(f"❌ Failed to parse unit {unit_data.get('id')}: {str(e)}")
+
+        stored = {
+            row["id"]: row
+            for row in PropertyUnit.objects.filter(property_id__in=list(apartments_by_property)).values("id", *UNIT_FIELDS)
+        }
+        # Units can move between properties, so also look up incoming ids stored elsewhere
+        missing = [unit_id for unit_id in incoming if unit_id not in stored]
+        stored.update({
+            row["id"]: row
+            for row in PropertyUnit.objects.filter(id__in=missing).values("id", *UNIT_FIELDS)
+        })
+
+        to_write = []
+        changed_properties = set()
+        for unit_id, unit in incoming.items():
+            row = stored.get(unit_id)
+            if row is not None and all(getattr(unit, field) == row[field] for field in UNIT_FIELDS):
+                self.stats["unchanged"] += 1
+                continue
+            self.stats["updated" if row is not None else "created"] += 1
+            to_write.append(unit)
+            changed_properties.add(unit.property_id)
+            if row is not None:
+                changed_properties.add(row["property_id"])
+
+        stale = [
+            unit_id for unit_id, row in stored.items()
+            if row["property_id"] in apartments_by_property and unit_id not in listed
+        ]
+        changed_properties.update(stored[unit_id]["property_id"] for unit_id in stale)
+
+        with transaction.atomic():
+            PropertyUnit.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=["property"] + UNIT_FIELDS[1:],
+            )
+            if stale:
+                PropertyUnit.objects.filter(id__in=stale).delete()
+        self.stats["deleted"] += len(stale)
+
+        log.info(f"✅ Units batch: {len(to_write)} written, {len(stale)} deleted for {len(apartments_by_property)} properties")
+        return sorted(changed_properties)
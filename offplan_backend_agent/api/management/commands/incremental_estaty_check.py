@@ -1,67 +1,192 @@
-import os
 from django.core.management.base import BaseCommand
 from django.utils.dateparse import parse_datetime
-from django.utils.timezone import make_aware, is_naive
-from api.models import Property
-import requests
-from dateutil import parser as date_parser
+from django.utils.timezone import make_aware, is_naive, now
+from api.models import Property, SyncState
+from api.data_versions import PROPERTY_DATA, REFERENCE_DATA, bump_version
+from api.estaty_client import DEFAULT_CONCURRENCY, DetailFetcher, EstatyClient
+from api.property_writer import PropertyBatchWriter
+from api.image_pipeline import ImagePipeline
+from api.search_index import refresh_search_documents
+from api.purge import purge_properties
+from api.property_media import queue_property_media
 from django.core.management import call_command
 import logging
+from datetime import timedelta
+from functools import partial
 from dotenv import load_dotenv
 
 load_dotenv()
 
-API_KEY = os.getenv("ESTATY_API_KEY")
-DETAIL_URL = "https://panel.estaty.app/api/v1/getProperty"
-HEADERS = {
-    "App-key": API_KEY,
-    "Content-Type": "application/json",
-}
+SYNC_NAME = "estaty-delta"
+# Recently updated local properties re-checked for deletion; off by default,
+# deletions are left to the full listing walk of import_estaty_properties
+DEFAULT_PROBE = 0
 
 log = logging.getLogger(__name__)
 
+
+def parse_updated_at(raw):
+    try:
+        value = parse_datetime(raw) if raw else None
+    except (TypeError, ValueError):
+        return None
+    if value is not None and is_naive(value):
+        value = make_aware(value)
+    return value
+
+
+def next_high_water_mark(current, newest, complete, failed_dates):
+    """
+    The mark to store after a run. It only moves when discovery walked far
+    enough to see every change; if some changed properties were not
+    written, it is capped just below the oldest of them so the next run
+    walks back to it (even if that means moving the mark back).
+    """
+    if not complete:
+        return current
+    if failed_dates:
+        return min(failed_dates) - timedelta(microseconds=1)
+    if newest and (current is None or newest > current):
+        return newest
+    return current
+
+
 class Command(BaseCommand):
-    help = "⏱ Incremental Estaty check (every 10 minutes)"
+    help = "⏱ Incremental Estaty sync (every 10 minutes): re-imports only properties updated since the last run"
 
-    def handle(self, *args, **kwargs):
-        print("🔍 Checking last 60 DB properties for changes...")
-        recent_props = Property.objects.order_by("-updated_at")[:60]
-        any_changed = False
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Run the full import_estaty_properties instead")
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel /getProperty requests")
+        parser.add_argument("--probe", type=int, default=DEFAULT_PROBE,
+                            help="Also re-check this many recently updated local properties for deletion upstream "
+                                 "(for an occasional run; default: none)")
+
+    def handle(self, *args, **options):
+        if options["full"]:
+            call_command("import_estaty_properties")
+            return
+
+        state, _ = SyncState.objects.get_or_create(name=SYNC_NAME)
+        client = EstatyClient(max_per_host=options["concurrency"])
+        local = dict(Property.objects.values_list("id", "updated_at"))
+
+        print(f"🔍 Looking for Estaty properties updated since {state.high_water_mark or 'the beginning'}...")
+        changed, newest, complete = self.discover_changes(client, state.high_water_mark, local)
+        if not complete:
+            print("⚠️ Could not read every changed page; the high-water mark stays where it is.")
+
+        # Deleted properties never show up as changed; an opt-in probe re-checks the newest local ones
+        probes = set()
+        if options["probe"]:
+            probes = set(Property.objects.order_by("-updated_at").values_list("id", flat=True)[:options["probe"]])
+        to_fetch = set(changed) | probes
+        if not to_fetch:
+            print("✅ No changes detected.")
+            state.high_water_mark = next_high_water_mark(state.high_water_mark, newest, complete, [])
+            state.last_run_at = now()
+            state.save(update_fields=["high_water_mark", "last_run_at"])
+            return
+
+        print(f"🔁 {len(changed)} properties changed — re-importing them ({len(probes - set(changed))} more re-checked)")
+        images = ImagePipeline()
+        writer = PropertyBatchWriter(on_saved=partial(queue_property_media, images))
+        images.on_stored = writer.confirm_images
+        fetcher = DetailFetcher(client, concurrency=options["concurrency"])
+
+        gone = []
+        for prop_id, detail in fetcher.iter_details(sorted(to_fetch)):
+            if detail:
+                print(f"📦 Fetched property ID: {prop_id} - {detail.get('title', 'No Title')}")
+                writer.add(detail)
+            elif prop_id not in fetcher.failed and prop_id in local:
+                print(f"❌ Property ID {prop_id} no longer in Estaty — deleting")
+                gone.append(prop_id)
+        writer.flush()
+        images.close()
+
+        if gone:
+            purge_properties(gone)
+
+        if writer.saved_ids:
+            call_command("import_property_unit", *writer.saved_ids)
+            refresh_search_documents(writer.saved_ids)
+            bump_version(REFERENCE_DATA)
+        if writer.saved_ids or gone:
+            bump_version(PROPERTY_DATA)
+
+        # Anything changed but neither written nor deleted (failed detail call)
+        # must be seen again next run, so the mark stops below it
+        written = set(writer.saved_ids) | set(writer.skipped_ids) | set(gone)
+        failed_dates = [updated_at for prop_id, updated_at in changed.items() if prop_id not in written]
+        state.high_water_mark = next_high_water_mark(state.high_water_mark, newest, complete, failed_dates)
+        state.last_run_at = now()
+        state.save(update_fields=["high_water_mark", "last_run_at"])
+        print(f"✅ Delta sync done: {len(writer.saved_ids)} written, {len(writer.skipped_ids)} unchanged, {len(gone)} deleted.")
+        print(f"🌐 Estaty API: {client.summary()}")
+
+    def discover_changes(self, client, high_water_mark, local):
+        """
+        Return ({id: updated_at} of properties newer than the local copy,
+        newest updated_at seen, whether discovery reached the high-water mark
+        or the end of the listing without errors).
+        """
+        changed = {}
+        newest = None
+
+        def consider(item):
+            nonlocal newest
+            updated_at = parse_updated_at(item.get("updated_at"))
+            prop_id = item.get("id")
+            if not prop_id or updated_at is None:
+                return None
+            newest = updated_at if newest is None or updated_at > newest else newest
+            local_updated = local.get(prop_id)
+            if prop_id not in local or local_updated is None or updated_at > local_updated:
+                changed[prop_id] = updated_at
+            return updated_at
 
-        for prop in recent_props:
-            try:
-                res = requests.post(DETAIL_URL, headers=HEADERS, json={"id": prop.id})
-                res.raise_for_status()
-                api_data = res.json().get("property")
-            except Exception as e:
-                log.error(f"❌ API error for ID {prop.id}: {e}")
-                continue
-
-            if not api_data:
-                print(f"❌ Property ID {prop.id} no longer in Estaty — deleting")
-                prop.delete()
-                any_changed = True
-                continue
-
-            if self.has_changed(prop, api_data):
-                print(f"🔁 Property ID {prop.id} changed — will re-sync")
-                any_changed = True
-                break  # no need to continue; we’ll fetch from page 1
-
-        if any_changed:
-            print("🔁 Changes detected. Running full sync from page 1...")
-            call_command("import_estaty_properties")  
-        else:
-            print("✅ No changes detected in last 60 properties.")
-
-    def has_changed(self, db_obj, api_data):
-        api_updated_raw = api_data.get("updated_at")
-        if not api_updated_raw:
-            return False
         try:
-            api_updated = parse_datetime(api_updated_raw)
-            if is_naive(api_updated):
-                api_updated = make_aware(api_updated)
-            return db_obj.updated_at < api_updated
+            window = client.latest_updated_properties()
         except Exception as e:
-            return True
+            log.error(f"❌ Error fetching latest updated properties: {e}")
+            window = []
+        window_dates = [consider(item) for item in window]
+
+        # The window is enough when it reaches back past the high-water mark;
+        # otherwise more changes may hide behind it, so check the listing too
+        reaches_mark = high_water_mark is not None and any(
+            updated_at is not None and updated_at <= high_water_mark for updated_at in window_dates
+        )
+        complete = reaches_mark or self.scan_listing(client, high_water_mark, consider)
+        return changed, newest, complete
+
+    def scan_listing(self, client, high_water_mark, consider):
+        """
+        Compare /getProperties summaries against the local rows (no detail calls).
+
+        While pages come back newest-updated first, the walk stops at the first
+        page entirely at or below the high-water mark; otherwise every page is read.
+        Returns False if a page could not be fetched.
+        """
+        print("📄 Checking the property listing for further changes...")
+        page = 1
+        previous = None
+        ordered = True
+        while True:
+            try:
+                summaries = client.get_properties(page)
+            except Exception as e:
+                log.error(f"❌ Error fetching property list (page {page}): {e}")
+                return False
+            if not summaries:
+                return True
+
+            dates = [consider(item) for item in summaries]
+            known = [d for d in dates if d is not None]
+            ordered = ordered and all(a >= b for a, b in zip([previous] + known, known) if a is not None)
+            if known:
+                previous = known[-1]
+
+            if ordered and high_water_mark is not None and known and known[0] <= high_water_mark:
+                return True
+            page += 1
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api.search_index import refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized property search documents used by /properties/filter/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Only rebuild these property IDs")
+
+    def handle(self, *args, **options):
+        property_ids = options["ids"] or None
+        self.stdout.write(self.style.SUCCESS("🔎 Rebuilding property search documents..."))
+        refreshed = refresh_search_documents(property_ids)
+        self.stdout.write(self.style.SUCCESS(f"✅ Done! {refreshed} search documents refreshed."))
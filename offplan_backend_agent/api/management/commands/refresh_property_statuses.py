@@ -0,0 +1,113 @@
+import csv
+import logging
+from collections import Counter
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Property, PropertyStatus
+from api.data_versions import PROPERTY_DATA, REFERENCE_DATA, bump_version
+from api.estaty_client import DEFAULT_CONCURRENCY, DetailFetcher, EstatyClient
+from api.filter_stream import iter_filter_properties
+from api.search_index import refresh_search_documents
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def status_of(data):
+    """(status id, status name) of an Estaty /filter or /getProperty payload; (None, None) if absent."""
+    status = data.get("property_status") if isinstance(data.get("property_status"), dict) else {}
+    return data.get("property_status_id") or status.get("id"), status.get("name")
+
+
+class Command(BaseCommand):
+    help = "Refresh every property's status from one /filter pass (detail calls only for gaps) and report the changes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel /getProperty requests for gaps")
+        parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+        parser.add_argument("--report", help="Also write the changes as CSV (id, title, old status, new status) to this file")
+
+    def handle(self, *args, **options):
+        client = EstatyClient(max_per_host=options["concurrency"])
+        local = dict(Property.objects.values_list("id", "property_status_id"))
+        self.stdout.write(f"🔍 Refreshing the status of {len(local)} properties...")
+
+        remote, names = {}, {}
+
+        def collect(prop_id, data):
+            status_id, name = status_of(data)
+            if status_id:
+                remote[prop_id] = status_id
+                if name:
+                    names.setdefault(status_id, name)
+
+        try:
+            for data in iter_filter_properties(client):
+                if data.get("id") in local:
+                    collect(data["id"], data)
+        except (requests.RequestException, ValueError) as e:
+            log.error(f"❌ Failed to read /filter, falling back to detail calls: {e}")
+
+        gaps = sorted(set(local) - set(remote))
+        if gaps:
+            self.stdout.write(f"📥 Fetching {len(gaps)} properties missing from /filter...")
+            for prop_id, detail in DetailFetcher(client, concurrency=options["concurrency"]).iter_details(gaps):
+                if detail:
+                    collect(prop_id, detail)
+
+        changed = {prop_id: status_id for prop_id, status_id in remote.items() if local[prop_id] != status_id}
+        unresolved = len(local) - len(remote)
+        self.report(changed, local, names, options["report"])
+
+        if changed and not options["dry_run"]:
+            with transaction.atomic():
+                known = set(PropertyStatus.objects.values_list("id", flat=True))
+                new_statuses = PropertyStatus.objects.bulk_create(
+                    [
+                        PropertyStatus(id=status_id, name=names.get(status_id, f"Status {status_id}"))
+                        for status_id in set(changed.values()) - known
+                    ],
+                    ignore_conflicts=True,
+                )
+                Property.objects.bulk_update(
+                    [Property(id=prop_id, property_status_id=status_id) for prop_id, status_id in changed.items()],
+                    ["property_status"],
+                    batch_size=BATCH_SIZE,
+                )
+            refresh_search_documents(list(changed))
+            if new_statuses:
+                # The filter name lookup must learn the new status names
+                bump_version(REFERENCE_DATA)
+            bump_version(PROPERTY_DATA)
+
+        verb = "would change" if options["dry_run"] else "changed"
+        self.stdout.write(self.style.SUCCESS(
+            f"🏁 Done! {len(changed)} {verb}, {len(remote) - len(changed)} unchanged, {unresolved} without a status"
+        ))
+        self.stdout.write(f"🌐 Estaty API: {client.summary()}")
+
+    def report(self, changed, local, names, path):
+        if not changed:
+            self.stdout.write(self.style.SUCCESS("✅ All statuses are up to date."))
+            return
+
+        stored_names = dict(PropertyStatus.objects.values_list("id", "name"))
+        label = lambda status_id: stored_names.get(status_id) or names.get(status_id) or ("None" if status_id is None else f"Status {status_id}")
+
+        transitions = Counter((local[prop_id], status_id) for prop_id, status_id in changed.items())
+        self.stdout.write("📊 Status changes:")
+        for (old, new), count in transitions.most_common():
+            self.stdout.write(f"   {label(old)} → {label(new)}: {count}")
+
+        if path:
+            titles = dict(Property.objects.filter(id__in=list(changed)).values_list("id", "title"))
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["id", "title", "old_status", "new_status"])
+                for prop_id, status_id in sorted(changed.items()):
+                    writer.writerow([prop_id, titles.get(prop_id, ""), label(local[prop_id]), label(status_id)])
+            self.stdout.write(f"📝 Wrote {len(changed)} changes to {path}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api.unit_rollups import refresh_unit_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored unit count and min/max unit price and area of properties"
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Only refresh these property IDs")
+
+    def handle(self, *args, **options):
+        property_ids = options["ids"] or None
+        self.stdout.write(self.style.SUCCESS("📊 Refreshing property unit rollups..."))
+        refreshed = refresh_unit_rollups(property_ids)
+        self.stdout.write(self.style.SUCCESS(f"✅ Done! {refreshed} properties refreshed."))
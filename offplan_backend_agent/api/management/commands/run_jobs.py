@@ -0,0 +1,48 @@
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+DEFAULT_CONCURRENCY = 4
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (blog translations...) with retries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Jobs processed in parallel")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the jobs due now and exit")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        outcomes = Counter()
+        self.stdout.write(f"👷 Job worker started ({concurrency} threads, handlers: {', '.join(sorted(jobs.HANDLERS))})")
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job") as executor:
+            try:
+                while True:
+                    # Top up free threads as soon as any job finishes, so one slow job never idles the rest
+                    jobs.requeue_stale()
+                    for queued in jobs.claim(concurrency - len(running)) if len(running) < concurrency else []:
+                        running[executor.submit(jobs.run, queued)] = queued
+                    if not running:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll"])
+                        continue
+                    done, _ = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        queued, status = running.pop(future), future.result()
+                        outcomes[status] += 1
+                        self.stdout.write(f"{'✅' if status == 'done' else '⚠️'} {queued}")
+            except KeyboardInterrupt:
+                self.stdout.write("🛑 Stopping worker, waiting for running jobs")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🏁 {outcomes['done']} done, {outcomes['pending']} to retry, {outcomes['failed']} failed"
+        ))
@@ -10,24 +10,20 @@ from api.models import (
     Property, City, District, DeveloperCompany, PropertyType,
     PropertyStatus, SalesStatus, Facility, PropertyUnit
 )
+from api.data_versions import PROPERTY_DATA, bump_version
+from api.search_index import refresh_search_documents
+from api.unit_rollups import refresh_unit_rollups
+from api.estaty_client import shared_client
 
 # ✅ Setup logger
 log = logging.getLogger("django")
 
-# ✅ API details
-LISTING_URL = "https://panel.estaty.app/api/v1/getProperties"
-SINGLE_PROPERTY_URL = "https://panel.estaty.app/api/v1/getProperty"
-FILTER_PROPERTY_URL = "https://panel.estaty.app/api/v1/filter"
+# ✅ API details (URLs, headers, retries and pacing live in api.estaty_client)
 API_KEY = os.getenv("ESTATY_API_KEY")
 
 if not API_KEY:
     raise RuntimeError("❌ Missing ESTATY_API_KEY in environment variables.")
 
-HEADERS = {
-    "App-key": API_KEY,
-    "Content-Type": "application/json",
-}
-
 # ✅ Utility to parse date safely
 def parse_unix_date(raw_date):
     if not raw_date or not isinstance(raw_date, str):
@@ -41,12 +37,8 @@ def parse_unix_date(raw_date):
 # ✅ Fetch properties for a page
 def fetch_external_properties(page):
     try:
-        url = f"{LISTING_URL}?page={page}"
         log.info(f"🌐 Fetching properties from page {page}")
-        response = requests.post(url, headers=HEADERS, json={})
-        response.raise_for_status()
-        data = response.json()
-        return data.get("properties", {}).get("data", [])
+        return shared_client().get_properties(page)
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch page {page}: {e}")
         return []
@@ -55,10 +47,7 @@ def fetch_external_properties(page):
 def fetch_property_by_id(prop_id):
     try:
         log.info(f"📥 Fetching details for property ID {prop_id}")
-        response = requests.post(SINGLE_PROPERTY_URL, headers=HEADERS, json={"id": prop_id})
-        response.raise_for_status()
-        data = response.json()
-        return data.get("property")
+        return shared_client().get_property(prop_id)
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch property ID {prop_id}: {e}")
         return None
@@ -67,12 +56,7 @@ def fetch_property_by_id(prop_id):
 def fetch_property_by_name(property_name):
     try:
         log.info(f"📥 Fetching details from /filter for: {property_name}")
-        response = requests.post(FILTER_PROPERTY_URL, headers=HEADERS, json={"property_name": property_name})
-        response.raise_for_status()
-        data = response.json()
-        if data.get("properties"):
-            return data["properties"][0]  # First matching property
-        return None
+        return shared_client().find_property(property_name)
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch property '{property_name}' from /filter: {e}")
         return None
@@ -159,6 +143,8 @@ def update_property(internal, external):
         if to_delete_units:
             log.info(f"🗑 Deleting {len(to_delete_units)} stale units for Property ID {internal.id}")
             PropertyUnit.objects.filter(id__in=to_delete_units).delete()
+
+        refresh_unit_rollups([internal.id])
     else:
         log.info(f"ℹ️ API returned empty units for property {internal.id}. Preserving existing units.")
 
@@ -173,6 +159,7 @@ class Command(BaseCommand):
                 page = 1
                 updated_count = 0
                 created_count = 0
+                touched_ids = []
 
                 while page <= 12:  # Limit to 10 pages
                     props = fetch_external_properties(page)
@@ -207,16 +194,20 @@ class Command(BaseCommand):
                         try:
                             internal = Property.objects.get(id=prop_id)
                             update_property(internal, primary_data)
+                            touched_ids.append(prop_id)
                             log.info(f"✅ Updated Property ID {prop_id}")
                             updated_count += 1
                         except Property.DoesNotExist:
                             new_property = Property(id=prop_id)
                             update_property(new_property, primary_data)
+                            touched_ids.append(prop_id)
                             log.info(f"➕ Created Property ID {prop_id}")
                             created_count += 1
 
                     page += 1
 
+                refresh_search_documents(touched_ids)
+                bump_version(PROPERTY_DATA)
                 log.info(f"\n📊 Sync Summary → Updated: {updated_count}, Created: {created_count}")
 
         except Exception as e:
@@ -11,6 +11,13 @@ from api.models import (
     PropertyStatus, SalesStatus, Facility, PropertyUnit,
     GroupedApartment, PropertyImage, PaymentPlan, PaymentPlanValue
 )
+from api.data_versions import PROPERTY_DATA, REFERENCE_DATA, bump_version
+from api.search_index import refresh_search_documents
+from api.estaty_client import shared_client
+from api.filter_stream import iter_filter_properties
+from api.purge import purge_properties, stale_property_ids
+from api.reference_sync import reconcile_reference_data
+from api.unit_rollups import refresh_unit_rollups
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,22 +25,13 @@ load_dotenv()
 # ✅ Logging setup
 log = logging.getLogger("django")
 
-# ✅ API Configuration
-FILTERS_URL = "https://panel.estaty.app/api/v1/getFilters"
-LISTING_URL = "https://panel.estaty.app/api/v1/getProperties"
-SINGLE_PROPERTY_URL = "https://panel.estaty.app/api/v1/getProperty"
-FILTER_PROPERTIES_URL = "https://panel.estaty.app/api/v1/filter"
+# ✅ API Configuration (URLs, headers, retries and pacing live in api.estaty_client)
 API_KEY = os.getenv("ESTATY_API_KEY")
 
 
 if not API_KEY:
     raise RuntimeError("❌ Missing ESTATY_API_KEY in Django settings.")
 
-HEADERS = {
-    "App-key": API_KEY,
-    "Content-Type": "application/json",
-}
-
 
 # ✅ Parse date safely to UNIX timestamp
 def parse_unix_date(raw_date):
@@ -75,40 +73,11 @@ def upsert_related_model(model, data):
 def sync_filters():
     try:
         log.info("🌐 Fetching filter data...")
-        response = requests.post(FILTERS_URL, headers=HEADERS, json={})
-        response.raise_for_status()
-        filters = response.json()
-
-        for city in filters.get("cities", []):
-            upsert_related_model(City, city)
-
-        for district in filters.get("districts", []):
-            city_obj = City.objects.filter(id=district.get("city_id")).first()
-            if not city_obj and district.get("city"):
-                city_obj = upsert_related_model(City, district["city"])
-            District.objects.update_or_create(
-                id=district["id"],
-                defaults={
-                    "name": district.get("name", "Unnamed District"),
-                    "city": city_obj,
-                },
-            )
-
-        for dev in filters.get("developer_companies", []):
-            upsert_related_model(DeveloperCompany, dev)
-
-        for prop_type in filters.get("property_types", []):
-            upsert_related_model(PropertyType, prop_type)
-
-        for status in filters.get("property_statuses", []):
-            upsert_related_model(PropertyStatus, status)
-
-        for sales in filters.get("sales_statuses", []):
-            upsert_related_model(SalesStatus, sales)
+        filters = shared_client().get_filters()
 
-        for fac in filters.get("facilities", []):
-            upsert_related_model(Facility, fac)
+        reconcile_reference_data(filters)
 
+        bump_version(REFERENCE_DATA)
         log.info("✅ Filters synced successfully.")
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch filters: {e}")
@@ -118,17 +87,15 @@ def sync_filters():
 def fetch_all_properties_and_apartments():
     try:
         log.info("🌐 Fetching all properties from /filter...")
-        response = requests.post(FILTER_PROPERTIES_URL, headers=HEADERS, json={})
-        response.raise_for_status()
-        data = response.json()
         property_apartments_map = {}
-        for prop in data.get("properties", []):
+        # Parsed one property at a time; only the apartments are kept
+        for prop in iter_filter_properties(shared_client()):
             prop_id = prop.get("id")
             apartments = prop.get("apartment", [])
             property_apartments_map[prop_id] = apartments
         log.info(f"✅ Cached apartments for {len(property_apartments_map)} properties")
         return property_apartments_map
-    except requests.RequestException as e:
+    except (requests.RequestException, ValueError) as e:
         log.error(f"❌ Failed to fetch properties from /filter: {e}")
         return {}
 
@@ -136,16 +103,7 @@ def fetch_all_properties_and_apartments():
 def fetch_property_details_by_name(property_name):
     try:
         log.info(f"📥 Fetching details from /filter for: {property_name}")
-        response = requests.post(
-            FILTER_PROPERTIES_URL,
-            headers=HEADERS,
-            json={"property_name": property_name}
-        )
-        response.raise_for_status()
-        data = response.json()
-        if data.get("properties"):
-            return data["properties"][0]  # API returns a list
-        return None
+        return shared_client().find_property(property_name)
     except requests.RequestException as e:
         log.error(f"❌ Failed /filter fetch for {property_name}: {e}")
         return None
@@ -154,12 +112,8 @@ def fetch_property_details_by_name(property_name):
 # ✅ Fetch property list (IDs only)
 def fetch_external_properties(page):
     try:
-        url = f"{LISTING_URL}?page={page}" if page > 1 else LISTING_URL
-        log.info(f"🌐 Fetching property IDs: {url}")
-        response = requests.post(url, headers=HEADERS, json={})
-        response.raise_for_status()
-        data = response.json()
-        return data.get("properties", {}).get("data", [])
+        log.info(f"🌐 Fetching property IDs from page {page}")
+        return shared_client().get_properties(page)
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch page {page}: {e}")
         return []
@@ -169,11 +123,9 @@ def fetch_external_properties(page):
 def fetch_property_by_id(prop_id):
     try:
         log.info(f"📥 Fetching details for property ID {prop_id}")
-        response = requests.post(SINGLE_PROPERTY_URL, headers=HEADERS, json={"id": prop_id})
-        response.raise_for_status()
-        data = response.json()
+        prop = shared_client().get_property(prop_id)
         log.info(f"🔎 Property {prop_id}")
-        return data.get("property")
+        return prop
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch property ID {prop_id}: {e}")
         return None
@@ -184,17 +136,10 @@ def delete_removed_properties(external_property_ids):
     """
     Delete local properties that no longer exist in the external API.
     """
-    local_property_ids = set(Property.objects.values_list("id", flat=True))
-    external_property_ids_set = set(external_property_ids)
-
-    to_delete_ids = local_property_ids - external_property_ids_set
+    to_delete_ids = stale_property_ids(external_property_ids)
     if to_delete_ids:
         log.info(f"🗑 Deleting {len(to_delete_ids)} properties no longer present in API.")
-        batch_size = 100
-        to_delete_ids = list(to_delete_ids)
-        for i in range(0, len(to_delete_ids), batch_size):
-            batch = to_delete_ids[i:i + batch_size]
-            Property.objects.filter(id__in=batch).delete()
+        purge_properties(to_delete_ids)
         log.info("✅ Deleted all missing properties.")
     else:
         log.info("✅ No properties to delete. All local properties exist in API.")
@@ -280,6 +225,8 @@ def sync_property_units(prop, external_units):
         log.info(f"🗑 Deleting {len(units_to_delete)} units no longer present in API for Property {prop.id}")
         PropertyUnit.objects.filter(id__in=units_to_delete).delete()
 
+    refresh_unit_rollups([prop.id])
+
 
 # ✅ Sync payment plans
 def sync_payment_plans(prop, external_payment_plans):
@@ -374,6 +321,7 @@ class Command(BaseCommand):
                 unchanged_counter = 0
 
                 all_external_property_ids = []
+                touched_ids = []
 
                 while True:
                     props = fetch_external_properties(page)
@@ -449,6 +397,7 @@ class Command(BaseCommand):
 
                             # ✅ Update property
                             update_internal_property(internal, full_data, property_apartments_map)
+                            touched_ids.append(prop_id)
                             log.info(f"✅ Updated Property ID {prop_id}")
                             updated_count += 1
                             unchanged_counter = 0  # Reset
@@ -457,15 +406,20 @@ class Command(BaseCommand):
                             # ✅ Create new property
                             new_property = Property(id=prop_id)
                             update_internal_property(new_property, full_data, property_apartments_map)
+                            touched_ids.append(prop_id)
                             log.info(f"➕ Created Property ID {prop_id}")
                             created_count += 1
                             unchanged_counter = 0  # Reset
                     page += 1
 
+                refresh_search_documents(touched_ids)
+                bump_version(PROPERTY_DATA)
+
                 # 🗑 Delete properties not in external API
                 # delete_removed_properties(all_external_property_ids)
 
                 log.info(f"\n📊 Sync Summary → Updated: {updated_count}, Created: {created_count}")
+                log.info(f"🌐 Estaty API: {shared_client().summary()}")
 
         except Exception as e:
             log.error(f"❌ Fatal error during sync: {e}")
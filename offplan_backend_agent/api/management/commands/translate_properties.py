@@ -1,359 +1,174 @@
-import re
 import time
-from itertools import chain
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from api.models import *
-from bs4 import BeautifulSoup
-from deep_translator import GoogleTranslator
-
-import html
-
-
-# def clean_text(text):
-#     # Remove everything except letters, numbers, and spaces
-#     return re.sub(r'[^\w\s]', '', text).strip()
-
-
-def clean_text(text):
-    # Remove HTML tags
-    soup = BeautifulSoup(text, "html.parser")
-    stripped = soup.get_text(separator=" ", strip=True)
-
-    # Unescape HTML entities like &nbsp;, &rsquo;
-    unescaped = html.unescape(stripped)
-
-    # Normalize whitespace
-    cleaned = ' '.join(unescaped.split())
-
-    return cleaned
+from api.data_versions import PROPERTY_DATA, REFERENCE_DATA, bump_version
+from api.translation import (
+    DEFAULT_CONCURRENCY, DEFAULT_RATE, PROVIDERS, TranslationPipeline, TranslationUnavailable, clean_text,
+    get_provider,
+)
+from api.translation_state import record, source_md5, stale_filter, stored_hashes
+
+LANGUAGES = ("ar", "fa")
+BATCH_SIZE = 500
+
+# (label, model, {source field: {language: target field}})
+SPECS = [
+    ("Property", Property, {
+        "title": {"ar": "arabic_title", "fa": "farsi_title"},
+        "description": {"ar": "arabic_desc", "fa": "farsi_desc"},
+    }),
+    ("City", City, {"name": {"ar": "arabic_city_name", "fa": "farsi_city_name"}}),
+    ("District", District, {"name": {"ar": "arabic_dist_name", "fa": "farsi_dist_name"}}),
+    ("grouped apartment", GroupedApartment, {
+        "unit_type": {"ar": "ar_unit_type", "fa": "fa_unit_type"},
+        "rooms": {"ar": "ar_rooms", "fa": "fa_rooms"},
+    }),
+    ("facility", Facility, {"name": {"ar": "ar_facility", "fa": "fa_facility"}}),
+    ("payment plan", PaymentPlan, {
+        "name": {"ar": "ar_plan_name", "fa": "fa_plan_name"},
+        "description": {"ar": "ar_plan_desc", "fa": "fa_plan_desc"},
+    }),
+    ("payment plan value", PaymentPlanValue, {"name": {"ar": "ar_value_name", "fa": "fa_value_name"}}),
+    ("property status", PropertyStatus, {"name": {"ar": "ar_prop_status", "fa": "fa_prop_status"}}),
+    ("sales status", SalesStatus, {"name": {"ar": "ar_sales_status", "fa": "fa_sales_status"}}),
+]
+
+
+def pending_fields(obj, fields, hashes, everything=False):
+    """
+    [(source text, language, target field, source hash)] to translate on
+    `obj`: empty targets, and targets last translated from a different
+    source (per `hashes`, see stored_hashes). A filled target without a
+    recorded hash is trusted. `everything` re-translates every target.
+    """
+    pending = []
+    for source, targets in fields.items():
+        value = getattr(obj, source)
+        text = clean_text(value) if value else None
+        if not text:
+            continue
+        digest = source_md5(value)
+        for lang, target in targets.items():
+            if everything or not getattr(obj, target) or hashes.get((obj.pk, target), digest) != digest:
+                pending.append((text, lang, target, digest))
+    return pending
+
+
+def translate_rows(pipeline, model, rows, fields, everything=False):
+    """
+    Translate `rows` in place through one pipeline pass per language;
+    returns (updated rows, changed fields, [(pk, target, source hash)]).
+    """
+    hashes = {} if everything else stored_hashes(model, [obj.pk for obj in rows])
+    work = {obj.pk: pending_fields(obj, fields, hashes, everything) for obj in rows}
+    translations = {
+        lang: pipeline.translate([text for items in work.values() for text, item_lang, _, _ in items if item_lang == lang], lang)
+        for lang in LANGUAGES
+    }
+
+    updated, changed, states = [], set(), []
+    for obj in rows:
+        touched = False
+        for text, lang, target, digest in work[obj.pk]:
+            translated = translations[lang].get(text)
+            if not translated:
+                continue
+            max_length = model._meta.get_field(target).max_length
+            setattr(obj, target, translated[:max_length] if max_length else translated)
+            changed.add(target)
+            states.append((obj.pk, target, digest))
+            touched = True
+        if touched:
+            updated.append(obj)
+    return updated, changed, states
 
 
 class Command(BaseCommand):
-    help = 'Translate Property, City, and District titles/descriptions to Arabic and Farsi'
-
-    def handle(self, *args, **kwargs):
-        ar_translator = GoogleTranslator(source='auto', target='ar')
-        fa_translator = GoogleTranslator(source='auto', target='fa')
-        
-        off_status = PropertyStatus.objects.get(name__iexact='Off Plan')
-        ready_status = PropertyStatus.objects.get(name__iexact='Ready')
-
-        # Translate Properties
-        properties = Property.objects.all()
-        offplan = Property.objects.filter(property_status=off_status).order_by('-updated_at')[:50]
-        ready = Property.objects.filter(property_status=ready_status).order_by('-updated_at')[:50]
-        combined = list(chain(offplan, ready, properties))
-        # print(combined,'combined')
-        for prop in properties:
-            try:
-                updated = False
-
-                cleaned_title = clean_text(prop.title) if prop.title else None
-                cleaned_desc = clean_text(prop.description) if prop.description else None
-
-                if  prop.arabic_title and cleaned_title:
-                    prop.arabic_title = ar_translator.translate(cleaned_title)
-                    updated = True
-                    time.sleep(1.2)
-
-                if  prop.farsi_title and cleaned_title:
-                    prop.farsi_title = fa_translator.translate(cleaned_title)
-                    updated = True
-                    time.sleep(1.2)
-
-                if  prop.arabic_desc and cleaned_desc:
-                    prop.arabic_desc = ar_translator.translate(cleaned_desc)
-                    updated = True
-                    time.sleep(1.2)
-
-                if  prop.farsi_desc and cleaned_desc:
-                    prop.farsi_desc = fa_translator.translate(cleaned_desc)
-                    updated = True
-                    time.sleep(1.2)
-
-                if updated:
-                    prop.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated Property: {prop.id} - {prop.title}"))
-                else:
-                    self.stdout.write(f"⏭ Skipped Property: {prop.id} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on Property ID {prop.id}: {e}"))
-
-        # for prop in properties:
-        #     try:
-        #         updated = False
-
-        #         if not prop.arabic_title and prop.title:
-        #             cleaned_title = clean_text(prop.title)
-        #             prop.arabic_title = ar_translator.translate(cleaned_title)
-        #             updated = True
-        #             time.sleep(1.2)
-
-        #         if not prop.farsi_title and prop.title:
-        #             cleaned_title = clean_text(prop.title)
-        #             prop.farsi_title = fa_translator.translate(cleaned_title)
-        #             updated = True
-        #             time.sleep(1.2)
-
-        #         if not prop.arabic_desc and prop.description:
-        #             cleaned_desc = clean_text(prop.description)
-        #             prop.arabic_desc = ar_translator.translate(cleaned_desc)
-        #             updated = True
-        #             time.sleep(1.2)
-
-        #         if not prop.farsi_desc and prop.description:
-        #             cleaned_desc = clean_text(prop.description)
-        #             prop.farsi_desc = fa_translator.translate(cleaned_desc)
-        #             updated = True
-        #             time.sleep(1.2)
-
-        #         if updated:
-        #             prop.save()
-        #             self.stdout.write(self.style.SUCCESS(f"✅ Translated Property: {prop.id} - {prop.title}"))
-        #         else:
-        #             self.stdout.write(f"⏭ Skipped Property: {prop.id} - Already translated")
-
-        #     except Exception as e:
-        #         self.stderr.write(self.style.ERROR(f"❌ Error on Property ID {prop.id}: {e}"))
-
-        # Translate Cities
-        for city in City.objects.all():
-            try:
-                updated = False
-
-                if not city.arabic_city_name and city.name:
-                    cleaned_name = clean_text(city.name)
-                    city.arabic_city_name = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not city.farsi_city_name and city.name:
-                    cleaned_name = clean_text(city.name)
-                    city.farsi_city_name = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if updated:
-                    city.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated City: {city.name}"))
-                else:
-                    self.stdout.write(f" Skipped City: {city.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on City '{city.name}': {e}"))
-
-        # Translate Districts
-        for district in District.objects.all():
-            try:
-                updated = False
-
-                if not district.arabic_dist_name and district.name:
-                    cleaned_name = clean_text(district.name)
-                    district.arabic_dist_name = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not district.farsi_dist_name and district.name:
-                    cleaned_name = clean_text(district.name)
-                    district.farsi_dist_name = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if updated:
-                    district.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated District: {district.name}"))
+    help = 'Translate properties, cities, districts, units, facilities, payment plans and statuses to Arabic and Farsi'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", choices=sorted(PROVIDERS), help="Translation provider (default: TRANSLATION_PROVIDER or google)")
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel provider calls")
+        parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Max provider calls per second")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows translated and written per bulk_update")
+        parser.add_argument("--no-memory", action="store_true", help="Bypass the translation memory table")
+        parser.add_argument("--all", action="store_true", help="Re-translate every row, not only new or changed source text")
+        parser.add_argument("--mark-current", action="store_true",
+                            help="Record the current source of every existing translation as up to date, without translating")
+
+    def handle(self, *args, **options):
+        pipeline = TranslationPipeline(
+            get_provider(options["provider"]), concurrency=options["concurrency"], rate=options["rate"],
+            memory=False if options["no_memory"] else None,
+        )
+        batch_size = options["batch_size"]
+        everything = options["all"]
+        if options["mark_current"]:
+            return self.mark_current(batch_size)
+
+        start = time.perf_counter()
+        total = 0
+
+        try:
+            for label, model, fields in SPECS:
+                targets = [target for lang_targets in fields.values() for target in lang_targets.values()]
+                queryset = model.objects.only("pk", *fields, *targets).order_by("pk")
+                if not everything:
+                    queryset = queryset.filter(stale_filter(model, fields))
+                translated = selected = 0
+                rows = []
+                for obj in queryset.iterator(chunk_size=batch_size):
+                    rows.append(obj)
+                    if len(rows) >= batch_size:
+                        translated += self.flush(pipeline, model, rows, fields, everything)
+                        selected += len(rows)
+                        rows = []
+                if rows:
+                    translated += self.flush(pipeline, model, rows, fields, everything)
+                    selected += len(rows)
+                total += translated
+                if selected:
+                    self.stdout.write(self.style.SUCCESS(f"✅ Translated {translated} of {selected} {label} rows needing it"))
                 else:
-                    self.stdout.write(f"⏭ Skipped District: {district.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on District '{district.name}': {e}"))
-        
-        
-        # group apartments
-        for grouped in GroupedApartment.objects.all():
-            try:
-                updated = False
-
-                if not grouped.ar_unit_type and grouped.unit_type:
-                    cleaned_name = clean_text(grouped.unit_type)
-                    grouped.ar_unit_type = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not grouped.fa_unit_type and grouped.unit_type:
-                    cleaned_name = clean_text(grouped.unit_type)
-                    grouped.fa_unit_type = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-                
-                if not grouped.ar_rooms and grouped.rooms:
-                    cleaned_name = clean_text(grouped.rooms)
-                    grouped.ar_rooms = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not grouped.fa_rooms and grouped.rooms:
-                    cleaned_name = clean_text(grouped.rooms)
-                    grouped.fa_rooms = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-
-                if updated:
-                    grouped.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated grouped apartment: {grouped.unit_type}"))
-                else:
-                    self.stdout.write(f" Skipped grouped apartment: {grouped.unit_type} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on grouped apartment '{grouped.unit_type}': {e}"))
-        
-        # facilities
-        for facility in Facility.objects.all():
-            try:
-                updated = False
-
-                if not facility.ar_facility and facility.name:
-                    cleaned_name = clean_text(facility.name)
-                    facility.ar_facility = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not facility.fa_facility and facility.name:
-                    cleaned_name = clean_text(facility.name)
-                    facility.fa_facility = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if updated:
-                    facility.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated facility: {facility.name}"))
-                else:
-                    self.stdout.write(f" Skipped facility: {facility.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on facility '{facility.name}': {e}"))
-            
-        # payment plan
-        for payment in PaymentPlan.objects.all():
-            try:
-                updated = False
-
-                if not payment.ar_plan_name and payment.name:
-                    cleaned_name = clean_text(payment.name)
-                    payment.ar_plan_name = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not payment.fa_plan_name and payment.name:
-                    cleaned_name = clean_text(payment.name)
-                    payment.fa_plan_name = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-                
-                if not payment.ar_plan_desc and payment.description:
-                    cleaned_name = clean_text(payment.description)
-                    payment.ar_plan_desc = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not payment.fa_plan_desc and payment.description:
-                    cleaned_name = clean_text(payment.description)
-                    payment.fa_plan_desc = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-
-                if updated:
-                    payment.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated payment plan: {payment.name}"))
-                else:
-                    self.stdout.write(f" Skipped payment plan: {payment.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on payment plan '{payment.name}': {e}"))
-        
-        # PaymentplanValue
-        for value in PaymentPlanValue.objects.all():
-            try:
-                updated = False
-
-                if not value.ar_value_name and value.name:
-                    cleaned_name = clean_text(value.name)
-                    value.ar_value_name = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not value.fa_value_name and value.name:
-                    cleaned_name = clean_text(value.name)
-                    value.fa_value_name = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-                
-                if updated:
-                    value.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated payment plan value: {value.name}"))
-                else:
-                    self.stdout.write(f" Skipped payment plan value: {value.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on payment plan value '{value.name}': {e}"))
-        
-        # property status
-
-        for prop_stat in PropertyStatus.objects.all():
-            try:
-                updated = False
-
-                if not prop_stat.ar_prop_status and prop_stat.name:
-                    cleaned_name = clean_text(prop_stat.name)
-                    prop_stat.ar_prop_status = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not prop_stat.fa_prop_status and prop_stat.name:
-                    cleaned_name = clean_text(prop_stat.name)
-                    prop_stat.fa_prop_status = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-                
-                if updated:
-                    prop_stat.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated property status: {prop_stat.name}"))
-                else:
-                    self.stdout.write(f" Skipped property status: {prop_stat.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on property status '{prop_stat.name}': {e}"))
-        # sales status
-        for sales in SalesStatus.objects.all():
-            try:
-                updated = False
-
-                if not sales.ar_sales_status and sales.name:
-                    cleaned_name = clean_text(sales.name)
-                    sales.ar_sales_status = ar_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-
-                if not sales.fa_sales_status and sales.name:
-                    cleaned_name = clean_text(sales.name)
-                    sales.fa_sales_status = fa_translator.translate(cleaned_name)
-                    updated = True
-                    time.sleep(1.2)
-                
-                if updated:
-                    sales.save()
-                    self.stdout.write(self.style.SUCCESS(f"✅ Translated sales status: {sales.name}"))
-                else:
-                    self.stdout.write(f" Skipped sales status: {sales.name} - Already translated")
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error on sales status '{sales.name}': {e}"))
-            
-            
-            
-            
-
+                    self.stdout.write(f"⏭ {label}: nothing new to translate")
+        except TranslationUnavailable as e:
+            # Batches written so far stay; the rest is picked up as stale by the next run
+            bump_version(REFERENCE_DATA)
+            bump_version(PROPERTY_DATA)
+            raise CommandError(f"❌ {e} after {total} rows. {pipeline.summary()}")
+
+        # Arabic/Farsi names of cities, districts and statuses feed the filter name lookup
+        bump_version(REFERENCE_DATA)
+        bump_version(PROPERTY_DATA)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"📊 {pipeline.summary()}, {total} rows in {elapsed:.1f}s")
         self.stdout.write(self.style.SUCCESS("🎉 All translations completed successfully."))
+
+    def flush(self, pipeline, model, rows, fields, everything):
+        try:
+            updated, changed, states = translate_rows(pipeline, model, rows, fields, everything)
+            if updated:
+                model.objects.bulk_update(updated, sorted(changed))
+                record(model, states)
+            return len(updated)
+        except TranslationUnavailable:
+            raise
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f"❌ Error on {model.__name__} {rows[0].pk}–{rows[-1].pk}: {e}"))
+            return 0
+
+    def mark_current(self, batch_size):
+        for label, model, fields in SPECS:
+            targets = [target for lang_targets in fields.values() for target in lang_targets.values()]
+            states = []
+            for obj in model.objects.only("pk", *fields, *targets).order_by("pk").iterator(chunk_size=batch_size):
+                for source, lang_targets in fields.items():
+                    value = getattr(obj, source)
+                    if value:
+                        states.extend((obj.pk, target, source_md5(value)) for target in lang_targets.values() if getattr(obj, target))
+                if len(states) >= batch_size:
+                    record(model, states)
+                    states = []
+            record(model, states)
+            self.stdout.write(self.style.SUCCESS(f"✅ Marked {label} translations as current"))
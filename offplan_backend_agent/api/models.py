@@ -1,10 +1,12 @@
 from django.db import models
 from django.utils.text import slugify
+from django.utils import timezone
 from storages.backends.s3boto3 import S3Boto3Storage
 from tinymce.models import HTMLField 
 from django.contrib import admin
 from django.utils.html import format_html
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
 class City(models.Model):
     name = models.CharField(max_length=100)
@@ -117,11 +119,21 @@ class Property(models.Model):
 
     updated_at = models.DateTimeField(blank=True, null=True)
 
+    # Rollups of property_units, kept current by api.unit_rollups
+    unit_count_total = models.IntegerField(default=0)
+    unit_min_price = models.FloatField(blank=True, null=True)
+    unit_max_price = models.FloatField(blank=True, null=True)
+    unit_min_area = models.FloatField(blank=True, null=True)
+    unit_max_area = models.FloatField(blank=True, null=True)
+
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['-updated_at', '-id'], name='property_updated_idx'),
+        ]
 
 class PropertyUnit(models.Model):
     id = models.BigIntegerField(primary_key=True)
@@ -209,6 +221,201 @@ class GroupedApartment(models.Model):
     def __str__(self):
         return f"{self.unit_type} - {self.rooms}"
 
+
+class PropertySearchDocument(models.Model):
+    # Flat copy of the columns FilterPropertiesView filters on
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name="search_document")
+    title = models.CharField(max_length=255)
+
+    city_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    district_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    developer_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    property_type_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    property_status_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    sales_status_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+
+    unit_types = models.TextField(blank=True, default="")  # newline separated GroupedApartment.unit_type values
+    rooms = ArrayField(models.CharField(max_length=100), default=list, blank=True)
+
+    delivery_date = models.BigIntegerField(null=True, blank=True, db_index=True)
+    low_price = models.BigIntegerField(null=True, blank=True, db_index=True)
+    min_area = models.IntegerField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-updated_at", "-property"], name="search_doc_updated_idx"),
+            GinIndex(fields=["rooms"], name="search_doc_rooms_gin"),
+        ]
+
+    def __str__(self):
+        return f"Search document for {self.property_id}"
+
+
+class PropertyFingerprint(models.Model):
+    # Per-section hashes of the Estaty payload last written for a property
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name="fingerprint")
+    payload_hash = models.CharField(max_length=64)
+    base_hash = models.CharField(max_length=64)
+    units_hash = models.CharField(max_length=64)
+    images_hash = models.CharField(max_length=64)
+    plans_hash = models.CharField(max_length=64)
+    facilities_hash = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fingerprint of {self.property_id}"
+
+
+class DataVersion(models.Model):
+    # Counter bumped whenever the data behind an in-process cache changes
+    name = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class RemoteImage(models.Model):
+    # HTTP validators and stored file of an image fetched from Estaty
+    url = models.TextField()
+    url_hash = models.CharField(max_length=64, unique=True)
+    etag = models.CharField(max_length=255, blank=True, default="")
+    last_modified = models.CharField(max_length=64, blank=True, default="")
+    content_hash = models.CharField(max_length=64, db_index=True)
+    storage_name = models.CharField(max_length=255)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+
+class SyncState(models.Model):
+    # Progress of a recurring sync, e.g. the delta sync's high-water mark
+    name = models.CharField(max_length=100, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.high_water_mark}"
+
+
+class ImportRun(models.Model):
+    # Checkpoint and counters of one import_estaty_properties run
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="running", db_index=True)
+    resumed_from = models.ForeignKey("self", on_delete=models.SET_NULL, null=True, blank=True, related_name="resumed_by")
+    started_at = models.DateTimeField(auto_now_add=True)
+    checkpoint_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    last_completed_page = models.IntegerField(default=0)
+    listed_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    completed_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+
+    pages_fetched = models.IntegerField(default=0)
+    properties_fetched = models.IntegerField(default=0)
+    properties_written = models.IntegerField(default=0)
+    properties_skipped = models.IntegerField(default=0)
+    requests = models.BigIntegerField(default=0)
+    bytes_downloaded = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Import run {self.id} ({self.status})"
+
+    @property
+    def elapsed_seconds(self):
+        end = self.finished_at or self.checkpoint_at or self.started_at
+        return max((end - self.started_at).total_seconds(), 0.0)
+
+    @property
+    def properties_per_second(self):
+        return self.properties_fetched / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def requests_per_second(self):
+        return self.requests / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class TranslationMemory(models.Model):
+    # A translation already paid for, per normalized source text and language
+    source_hash = models.CharField(max_length=64)
+    language = models.CharField(max_length=10)
+    source = models.TextField()
+    translation = models.TextField()
+    provider = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source_hash', 'language'], name='unique_translation_memory'),
+        ]
+
+    def __str__(self):
+        return f"{self.language}: {self.source[:50]}"
+
+
+class TranslationState(models.Model):
+    # Hash of the source text a translated column was last produced from
+    model_label = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    field = models.CharField(max_length=100)
+    source_hash = models.CharField(max_length=32)
+    translated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_label', 'object_id', 'field'], name='unique_translation_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} {self.object_id}.{self.field}"
+
+
+class BackgroundJob(models.Model):
+    # Deferred work picked up by the run_jobs worker
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='backgroundjob_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+    @property
+    def is_last_attempt(self):
+        return self.attempts >= self.max_attempts
+
+
 class AgentDetails(models.Model):
     GENDER_CHOICES = [
         ('male', 'Male'),
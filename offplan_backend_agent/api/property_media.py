@@ -0,0 +1,27 @@
+from api.image_pipeline import COVER_DIR, GALLERY_DIR, Cover, GalleryImage, already_stored
+
+
+def queue_property_media(images, prop, data):
+    """
+    Queue on `images` (an ImagePipeline) the cover and gallery images of a
+    property written by PropertyBatchWriter, skipping the ones already stored.
+    Used as the writer's on_saved callback by the import and delta sync
+    commands; the jobs are grouped under the property id so the pipeline can
+    report back (see PropertyBatchWriter.confirm_images).
+    """
+    cover_url = data.get("cover")
+    images_data = [img for img in data.get("property_images") or [] if img.get("image")]
+    known = images.known_names([cover_url] + [img["image"] for img in images_data])
+    jobs = []
+
+    # ✅ Cover - only download if changed
+    if cover_url and not already_stored(prop.cover.name if prop.cover else "", cover_url, known):
+        jobs.append((cover_url, COVER_DIR, Cover(prop.id)))
+
+    # ✅ Gallery - only images not attached yet
+    existing = list(prop.property_images.values_list("image", flat=True))
+    for img in images_data:
+        if not any(already_stored(name, img["image"], known) for name in existing):
+            jobs.append((img["image"], GALLERY_DIR, GalleryImage(prop.id, img.get("type", 2))))
+
+    images.add(jobs, group=prop.id)
@@ -282,12 +282,10 @@ class PropertySerializer(serializers.ModelSerializer):
         }
 
     def get_subunit_count(self, obj):
-        # Fetch the annotated count
+        # Prefer an annotated count, otherwise the stored rollup
         total_subunits = getattr(obj, "subunit_count", None)
         if total_subunits is None:
-            total_subunits = PropertyUnit.objects.filter(
-                property=obj
-            ).aggregate(total=Sum('unit_count'))['total'] or 0
+            total_subunits = obj.unit_count_total or 0
 
         # Format count and translated label
         if total_subunits <= 1:
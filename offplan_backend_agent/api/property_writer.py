@@ -0,0 +1,315 @@
+import logging
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import make_aware, now, is_naive
+
+from api.fingerprints import changed_sections, fingerprint_payload, held_back, save_fingerprints, stored_fingerprints
+from api.models import (
+    City, District, DeveloperCompany, PropertyType, PropertyStatus, SalesStatus,
+    Facility, Property, GroupedApartment, PaymentPlan, PaymentPlanValue,
+)
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+# Property columns written from an Estaty /getProperty payload
+PROPERTY_FIELDS = [
+    "title", "description", "address", "address_text", "delivery_date",
+    "city", "district", "developer", "property_type", "property_status", "sales_status",
+    "completion_rate", "residential_units", "commercial_units", "payment_plan",
+    "post_delivery", "payment_minimum_down_payment",
+    "guarantee_rental_guarantee", "guarantee_rental_guarantee_value",
+    "downPayment", "low_price", "min_area", "updated_at",
+]
+
+
+def convert_mm_yyyy_to_yyyymm(date_str: str) -> Optional[int]:
+    try:
+        month, year = date_str.strip().split('/')
+        return int(f"{year}{int(month):02d}")
+    except Exception:
+        return None
+
+
+def _parse_updated_at(raw):
+    updated_at = (parse_datetime(raw) if raw else None) or now()
+    return make_aware(updated_at) if is_naive(updated_at) else updated_at
+
+
+class PropertyBatchWriter:
+    """
+    Buffers parsed Estaty property payloads and writes them in batches.
+
+    Every payload is fingerprinted per section (see api.fingerprints).
+    Properties whose fingerprint is unchanged are skipped; for the others only
+    the changed sections are written. Each flush runs in one transaction:
+    reference rows, properties and facilities are upserted with
+    bulk_create(update_conflicts=True), the facility links are rewritten
+    through the M2M table in one delete + insert, and grouped apartments /
+    payment plans are recreated in bulk. Properties without a stored
+    fingerprint (or with `force`) fall back to the old rule of recreating
+    child rows only when their count changed, so translated rows survive.
+
+    `on_saved(prop, data)` is called after the transaction commits for every
+    property whose cover or gallery changed, for work that must not hold it
+    open (image downloads). Until confirm_images() is called for such a
+    property its fingerprint keeps the old images hash, so a download that
+    fails or is interrupted is retried by the next import. `on_flush(ids)` is
+    called with the ids done, written or skipped as unchanged (import
+    checkpoints): after every flush, and for the properties with new images
+    only once they are confirmed.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, on_saved=None, force=False, on_flush=None):
+        self.batch_size = batch_size
+        self.on_saved = on_saved
+        self.on_flush = on_flush
+        self.force = force
+        self.pending = []
+        self.saved_ids = []
+        self.skipped_ids = []
+        self.awaiting_images = {}  # property id -> fingerprint to save once its images are stored
+
+    def add(self, data):
+        """Queue one /getProperty payload; returns False when it is skipped as invalid."""
+        if not data.get("id"):
+            log.warning(f"⚠️ Skipping invalid property (missing ID): {data}")
+            return False
+        if not (data.get("district") or {}).get("id"):
+            log.warning(f"⚠️ Skipping property due to missing district ID: {data.get('district')}")
+            return False
+
+        self.pending.append(data)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self.pending:
+            return []
+        # The API can list a property twice across pages; keep the last payload
+        payloads = {data["id"]: data for data in self.pending}
+        self.pending = []
+
+        hashes = {prop_id: fingerprint_payload(data) for prop_id, data in payloads.items()}
+        stored = {} if self.force else stored_fingerprints(list(payloads))
+        changes = {prop_id: changed_sections(hashes[prop_id], stored.get(prop_id)) for prop_id in payloads}
+
+        unchanged = [prop_id for prop_id, sections in changes.items() if not sections]
+        self.skipped_ids.extend(unchanged)
+        batch = [data for prop_id, data in payloads.items() if changes[prop_id]]
+        if not batch:
+            log.info(f"⏭️ Skipped batch of {len(unchanged)} unchanged properties")
+            if self.on_flush:
+                self.on_flush(unchanged)
+            return []
+
+        def touching(section):
+            return [data for data in batch if section in changes[data["id"]]]
+
+        fingerprinted = set(stored)
+        with_new_images = touching("images") if self.on_saved else []
+        to_save = {data["id"]: hashes[data["id"]] for data in batch}
+        for data in with_new_images:
+            self.awaiting_images[data["id"]] = to_save[data["id"]]
+            to_save[data["id"]] = held_back(to_save[data["id"]], stored.get(data["id"]), "images")
+
+        with transaction.atomic():
+            self._write_reference_data(touching("base"))
+            self._write_properties(touching("base"))
+            self._write_facilities(touching("facilities"))
+            self._write_grouped_apartments(touching("units"), fingerprinted)
+            self._write_payment_plans(touching("plans"), fingerprinted)
+            save_fingerprints(to_save)
+
+        ids = [data["id"] for data in batch]
+        self.saved_ids.extend(ids)
+        log.info(f"💾 Wrote batch of {len(ids)} properties ({len(unchanged)} unchanged skipped)")
+        if self.on_flush:
+            self.on_flush([prop_id for prop_id in ids if prop_id not in self.awaiting_images] + unchanged)
+
+        if with_new_images:
+            properties = Property.objects.only("id", "title", "cover").in_bulk([data["id"] for data in with_new_images])
+            for data in with_new_images:
+                self.on_saved(properties[data["id"]], data)
+        return ids
+
+    def confirm_images(self, prop_ids):
+        """Images of `prop_ids` are stored (ImagePipeline.on_stored): save their full fingerprint."""
+        confirmed = {prop_id: self.awaiting_images.pop(prop_id) for prop_id in prop_ids if prop_id in self.awaiting_images}
+        if not confirmed:
+            return
+        save_fingerprints(confirmed)
+        if self.on_flush:
+            self.on_flush(list(confirmed))
+
+    # --------------- REFERENCE DATA -----------------------
+
+    def _collect(self, batch, key, build):
+        rows = {}
+        for data in batch:
+            item = data.get(key) or {}
+            if item.get("id"):
+                rows[item["id"]] = build(item, data)
+        return list(rows.values())
+
+    def _write_reference_data(self, batch):
+        # Developers are only created here; their profiles come from sync_developers_detailed
+        developers = self._collect(batch, "developer_company", lambda d, _: DeveloperCompany(
+            id=d["id"], name=d.get("name") or "Unnamed Developer"
+        ))
+        DeveloperCompany.objects.bulk_create(developers, ignore_conflicts=True)
+
+        upserts = [
+            (City, "city", ["name"], lambda d, _: City(id=d["id"], name=d.get("name") or "Unnamed City")),
+            (District, "district", ["name", "city"], lambda d, data: District(
+                id=d["id"], name=d.get("name") or "Unnamed District",
+                city_id=(data.get("city") or {}).get("id"),
+            )),
+            (PropertyType, "property_type", ["name"], lambda d, _: PropertyType(
+                id=d["id"], name=d.get("name") or "Unnamed Type"
+            )),
+            (PropertyStatus, "property_status", ["name"], lambda d, _: PropertyStatus(
+                id=d["id"], name=d.get("name") or "Unnamed Status"
+            )),
+            (SalesStatus, "sales_status", ["name"], lambda d, _: SalesStatus(
+                id=d["id"], name=d.get("name") or "Unnamed Sales Status"
+            )),
+        ]
+        # Cities first: districts reference them
+        for model, key, update_fields, build in upserts:
+            model.objects.bulk_create(
+                self._collect(batch, key, build),
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=update_fields,
+            )
+
+    # --------------- PROPERTIES -----------------------
+
+    def _build_property(self, data):
+        ref = lambda key: (data.get(key) or {}).get("id")
+        return Property(
+            id=data["id"],
+            title=data.get("title") or f"Untitled Property {data['id']}",
+            description=data.get("description") or "",
+            address=data.get("address"),
+            address_text=data.get("address_text"),
+            delivery_date=convert_mm_yyyy_to_yyyymm(data.get("delivery_date")),
+            city_id=ref("city"),
+            district_id=ref("district"),
+            developer_id=ref("developer_company"),
+            property_type_id=ref("property_type"),
+            property_status_id=ref("property_status"),
+            sales_status_id=ref("sales_status"),
+            completion_rate=data.get("completion_rate") or 0,
+            residential_units=data.get("residential_units") or 0,
+            commercial_units=data.get("commercial_units") or 0,
+            payment_plan=data.get("payment_plan") or 0,
+            post_delivery=data.get("post_delivery") == 1,
+            payment_minimum_down_payment=data.get("payment_minimum_down_payment") or 0,
+            guarantee_rental_guarantee=data.get("guarantee_rental_guarantee") == 1,
+            guarantee_rental_guarantee_value=data.get("guarantee_rental_guarantee_value") or 0,
+            downPayment=data.get("downPayment") or 0,
+            low_price=data.get("low_price") or 0,
+            min_area=data.get("min_area") or 0,
+            updated_at=_parse_updated_at(data.get("updated_at")),
+        )
+
+    def _write_properties(self, batch):
+        Property.objects.bulk_create(
+            [self._build_property(data) for data in batch],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=PROPERTY_FIELDS,
+        )
+
+    def _write_facilities(self, batch):
+        facilities = {}
+        for data in batch:
+            for f in data.get("property_facilities", []):
+                f_data = f.get("facility", {})
+                if f_data.get("id"):
+                    facilities[f_data["id"]] = Facility(id=f_data["id"], name=f_data.get("name") or "Unnamed Facility")
+        Facility.objects.bulk_create(list(facilities.values()), ignore_conflicts=True)
+
+        Through = Property.facilities.through
+        links = {
+            (data["id"], f["facility"]["id"])
+            for data in batch
+            for f in data.get("property_facilities", [])
+            if (f.get("facility") or {}).get("id")
+        }
+        Through.objects.filter(property_id__in=[data["id"] for data in batch]).delete()
+        Through.objects.bulk_create(
+            [Through(property_id=prop_id, facility_id=facility_id) for prop_id, facility_id in links]
+        )
+
+    # --------------- CHILD ROWS -----------------------
+
+    def _needs_rewrite(self, model, batch, key, fingerprinted):
+        """
+        Ids whose child rows must be recreated: a changed section hash is
+        trusted; without a previous fingerprint only a changed row count is.
+        """
+        unknown = [data for data in batch if data["id"] not in fingerprinted]
+        counts = dict(
+            model.objects.filter(property_id__in=[data["id"] for data in unknown])
+            .values_list("property_id").annotate(total=Count("id"))
+        ) if unknown else {}
+        return {
+            data["id"] for data in batch
+            if data["id"] in fingerprinted or counts.get(data["id"], 0) != len(data.get(key) or [])
+        }
+
+    def _write_grouped_apartments(self, batch, fingerprinted):
+        changed = self._needs_rewrite(GroupedApartment, batch, "grouped_apartments", fingerprinted)
+        if not changed:
+            return
+        GroupedApartment.objects.filter(property_id__in=changed).delete()
+        GroupedApartment.objects.bulk_create([
+            GroupedApartment(
+                property_id=data["id"],
+                unit_type=g.get("Unit_Type", ""),
+                rooms=g.get("Rooms", ""),
+                min_price=g.get("min_price"),
+                min_area=g.get("min_area"),
+            )
+            for data in batch if data["id"] in changed
+            for g in data.get("grouped_apartments") or []
+        ])
+
+    def _write_payment_plans(self, batch, fingerprinted):
+        changed = self._needs_rewrite(PaymentPlan, batch, "payment_plans", fingerprinted)
+        if not changed:
+            return
+        PaymentPlan.objects.filter(property_id__in=changed).delete()
+
+        incoming = [
+            plan
+            for data in batch if data["id"] in changed
+            for plan in data.get("payment_plans") or []
+        ]
+        plans = PaymentPlan.objects.bulk_create([
+            PaymentPlan(
+                property_id=data["id"],
+                name=plan.get("name"),
+                description=plan.get("description") or "",
+            )
+            for data in batch if data["id"] in changed
+            for plan in data.get("payment_plans") or []
+        ])
+        # bulk_create sets primary keys on PostgreSQL, in input order
+        PaymentPlanValue.objects.bulk_create([
+            PaymentPlanValue(
+                property_payment_plan=pp,
+                name=val.get("name"),
+                value=val.get("value"),
+            )
+            for pp, plan in zip(plans, incoming)
+            for val in plan.get("values", [])
+        ])
@@ -0,0 +1,92 @@
+import logging
+import time
+
+from django.db import connection, models, transaction
+
+from api.data_versions import PROPERTY_DATA, bump_version
+from api.models import Property
+
+log = logging.getLogger(__name__)
+
+
+class PurgeStats(dict):
+    """table -> [rows affected, seconds]"""
+
+    def record(self, table, rows, seconds):
+        entry = self.setdefault(table, [0, 0.0])
+        entry[0] += rows
+        entry[1] += seconds
+
+    def lines(self):
+        return [f"{table}: {rows} rows in {seconds * 1000:.1f} ms" for table, (rows, seconds) in self.items()]
+
+
+def _execute(cursor, stats, table, sql, params):
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    stats.record(table, max(cursor.rowcount, 0), time.perf_counter() - start)
+
+
+def _purge(cursor, stats, model, where, params):
+    """
+    Delete the rows of `model` matching `where`, and everything the ORM
+    collector would cascade to, with one statement per table. Children are
+    addressed through a subquery on their parent instead of loaded ids.
+    """
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    selected = f"SELECT {qn(model._meta.pk.column)} FROM {qn(table)} WHERE {where}"
+
+    for rel in model._meta.related_objects:
+        if rel.many_to_many:
+            through = rel.through._meta
+            column = next(f.column for f in through.fields if f.is_relation and f.related_model is model)
+            _execute(cursor, stats, through.db_table,
+                     f"DELETE FROM {qn(through.db_table)} WHERE {qn(column)} IN ({selected})", params)
+            continue
+
+        child_where = f"{qn(rel.field.column)} IN ({selected})"
+        if rel.on_delete is models.CASCADE:
+            _purge(cursor, stats, rel.related_model, child_where, params)
+        elif rel.on_delete is models.SET_NULL:
+            child_table = rel.related_model._meta.db_table
+            _execute(cursor, stats, child_table,
+                     f"UPDATE {qn(child_table)} SET {qn(rel.field.column)} = NULL WHERE {child_where}", params)
+        elif rel.on_delete is not models.DO_NOTHING:
+            raise ValueError(f"purge cannot apply {rel.on_delete.__name__} on {rel.related_model.__name__}.{rel.field.name}")
+
+    for field in model._meta.local_many_to_many:
+        through = field.remote_field.through._meta
+        _execute(cursor, stats, through.db_table,
+                 f"DELETE FROM {qn(through.db_table)} WHERE {qn(field.m2m_column_name())} IN ({selected})", params)
+
+    _execute(cursor, stats, table, f"DELETE FROM {qn(table)} WHERE {where}", params)
+
+
+def purge_properties(property_ids):
+    """
+    Delete the given properties with their units, images, plans, plan values,
+    grouped apartments, facility links and derived rows in one transaction,
+    using set-based DELETEs (WHERE property_id = ANY(...)) instead of the
+    per-object cascade collector, then bump PROPERTY_DATA so no cached
+    response keeps listing them. Returns PurgeStats per table.
+
+    Raw deletes skip pre/post_delete signals; no Property-related model uses them.
+    """
+    stats = PurgeStats()
+    property_ids = sorted(set(property_ids))
+    if not property_ids:
+        return stats
+
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        _purge(cursor, stats, Property, f"{qn(Property._meta.pk.column)} = ANY(%s)", [property_ids])
+    bump_version(PROPERTY_DATA)
+
+    log.info(f"🗑 Purged {len(property_ids)} properties: " + "; ".join(stats.lines()))
+    return stats
+
+
+def stale_property_ids(live_ids):
+    """Local property ids that are not in `live_ids`."""
+    return set(Property.objects.values_list("id", flat=True)) - set(live_ids)
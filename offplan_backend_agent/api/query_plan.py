@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+
+def _model_field(model, source):
+    if not source or source == "*" or "." in source:
+        return None
+    try:
+        field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _walk(serializer, prefix, select, prefetch, under_prefetch):
+    model = serializer.Meta.model
+    for field in serializer.fields.values():
+        model_field = _model_field(model, field.source)
+        if model_field is None:
+            continue
+        path = prefix + field.source
+
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(path)
+            if isinstance(field.child, serializers.ModelSerializer):
+                _walk(field.child, path + "__", select, prefetch, under_prefetch=True)
+        elif isinstance(field, serializers.ModelSerializer):
+            (prefetch if under_prefetch else select).append(path)
+            _walk(field, path + "__", select, prefetch, under_prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(path)
+        # A plain RelatedField on a foreign key only reads the *_id column
+
+
+@lru_cache(maxsize=None)
+def serializer_query_plan(serializer_class):
+    """
+    Derive the (select_related, prefetch_related) lookups a ModelSerializer needs.
+
+    Nested serializers on forward foreign keys become select_related joins,
+    many=True serializers and many-to-many fields become prefetches, and
+    anything nested below a prefetch is prefetched too.
+    """
+    select, prefetch = [], []
+    _walk(serializer_class(), "", select, prefetch, under_prefetch=False)
+    return tuple(select), tuple(prefetch)
+
+
+def apply_query_plan(queryset, serializer_class):
+    select, prefetch = serializer_query_plan(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    """
+    Context manager that fails when more than `max_queries` queries run inside it.
+
+        with QueryBudget(8):
+            self.client.get("/api/property/1/")
+    """
+
+    def __init__(self, max_queries, using="default"):
+        self.max_queries = max_queries
+        self.context = CaptureQueriesContext(connections[using])
+
+    def __enter__(self):
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        executed = len(self.context)
+        if executed > self.max_queries:
+            statements = "\n".join(
+                f"{i}. {query['sql']}" for i, query in enumerate(self.context.captured_queries, start=1)
+            )
+            raise QueryBudgetExceeded(
+                f"{executed} queries executed, budget was {self.max_queries}:\n{statements}"
+            )
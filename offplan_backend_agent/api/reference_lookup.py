@@ -0,0 +1,96 @@
+import re
+import threading
+import unicodedata
+
+from api.data_versions import REFERENCE_DATA, get_version
+from api.models import City, District, DeveloperCompany, PropertyType, PropertyStatus, SalesStatus
+
+# table name -> (model, columns holding the English/Arabic/Farsi names)
+REFERENCE_TABLES = {
+    "city": (City, ["name", "arabic_city_name", "farsi_city_name"]),
+    "district": (District, ["name", "arabic_dist_name", "farsi_dist_name"]),
+    "property_type": (PropertyType, ["name"]),
+    "property_status": (PropertyStatus, ["name", "ar_prop_status", "fa_prop_status"]),
+    "sales_status": (SalesStatus, ["name", "ar_sales_status", "fa_sales_status"]),
+    "developer": (DeveloperCompany, ["name"]),
+}
+
+MAX_CACHED_TERMS = 2048
+
+# Arabic and Farsi keyboards produce different code points for the same letters
+_LETTER_VARIANTS = str.maketrans({
+    "ي": "ی", "ى": "ی", "ك": "ک",
+    "أ": "ا", "إ": "ا", "آ": "ا",
+    "ة": "ه", "ۀ": "ه",
+    "ـ": None,  # tatweel
+})
+_DIACRITICS = re.compile(r"[\u064B-\u065F\u0670]")
+
+
+def normalize_name(value):
+    """Fold case, width, whitespace and Arabic/Farsi letter variants so names compare equal."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKC", str(value)).casefold()
+    value = _DIACRITICS.sub("", value).translate(_LETTER_VARIANTS)
+    return " ".join(value.split())
+
+
+class ReferenceLookup:
+    """Snapshot of the reference tables used to turn filter names into id sets."""
+
+    def __init__(self, version):
+        self.version = version
+        self.names = {}    # table -> {id: English name}
+        self.entries = {}  # table -> [(id, [normalized names])]
+        self._resolved = {}
+
+        for table, (model, columns) in REFERENCE_TABLES.items():
+            rows = model.objects.values_list("id", *columns)
+            self.names[table] = {row[0]: row[1] for row in rows}
+            self.entries[table] = [
+                (row[0], [normalize_name(name) for name in row[1:] if name])
+                for row in rows
+            ]
+
+    def resolve(self, table, term, exact=False):
+        """Return the ids whose name in any language contains (or equals, when `exact`) `term`."""
+        key = (table, normalize_name(term), exact)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        needle = key[1]
+        if exact:
+            ids = frozenset(pk for pk, names in self.entries[table] if needle in names)
+        else:
+            ids = frozenset(pk for pk, names in self.entries[table] if any(needle in name for name in names))
+
+        if len(self._resolved) >= MAX_CACHED_TERMS:
+            self._resolved.clear()
+        self._resolved[key] = ids
+        return ids
+
+    def name(self, table, pk):
+        return self.names[table].get(pk)
+
+
+_lookup = None
+_lock = threading.Lock()
+
+
+def get_reference_lookup():
+    """Return the process-wide lookup, rebuilding it when the reference data version moved."""
+    global _lookup
+    version = get_version(REFERENCE_DATA)
+    lookup = _lookup
+    if lookup is not None and lookup.version == version:
+        return lookup
+
+    with _lock:
+        if _lookup is None or _lookup.version != version:
+            _lookup = ReferenceLookup(version)
+        return _lookup
+
+
+def resolve_ids(table, term, exact=False):
+    return get_reference_lookup().resolve(table, term, exact=exact)
@@ -0,0 +1,119 @@
+import logging
+from collections import namedtuple
+
+from django.db import transaction
+
+from api.models import City, District, DeveloperCompany, PropertyType, PropertyStatus, SalesStatus, Facility
+
+log = logging.getLogger(__name__)
+
+ReconcileStats = namedtuple("ReconcileStats", "created updated deleted unchanged")
+
+
+def _named(model, item):
+    return {"name": item.get("name") or f"Unnamed {model.__name__}"}
+
+
+def _referenced_ids(model):
+    """Ids of `model` rows that some other row still points at."""
+    ids = set()
+    for rel in model._meta.related_objects:
+        if rel.many_to_many:
+            through = rel.through
+            column = next(f.attname for f in through._meta.fields if f.is_relation and f.related_model is model)
+            ids.update(through.objects.values_list(column, flat=True).distinct())
+        else:
+            ids.update(
+                rel.related_model.objects.filter(**{f"{rel.field.attname}__isnull": False})
+                .values_list(rel.field.attname, flat=True).distinct()
+            )
+    return ids
+
+
+def reconcile(model, rows, delete=True):
+    """
+    Make the `model` table match `rows` ({id: {attname: value}}) with one
+    read, then a bulk_create of the new ids, a bulk_update of the changed
+    ones and a delete of the ids no longer listed, in one transaction.
+
+    Only the given columns are compared and written, so translations and
+    other local columns are kept. Rows still referenced (by properties,
+    districts, facility links) are never deleted.
+    """
+    if not rows:
+        # An empty list means a broken payload far more often than an empty table
+        log.warning(f"⚠️ No {model.__name__} rows in /getFilters, leaving the table untouched")
+        return ReconcileStats(0, 0, 0, 0)
+
+    attnames = sorted({name for values in rows.values() for name in values})
+    fields = [model._meta.get_field(name).name for name in attnames]
+
+    with transaction.atomic():
+        existing = {obj.pk: obj for obj in model.objects.only("pk", *fields)}
+
+        created, updated = [], []
+        for pk, values in rows.items():
+            obj = existing.get(pk)
+            if obj is None:
+                created.append(model(pk=pk, **values))
+            elif any(getattr(obj, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(obj, name, value)
+                updated.append(obj)
+
+        stale = set(existing) - set(rows)
+        if stale and delete:
+            stale -= _referenced_ids(model)
+        else:
+            stale = set()
+
+        model.objects.bulk_create(created)
+        if updated:
+            model.objects.bulk_update(updated, fields)
+        if stale:
+            model.objects.filter(pk__in=stale).delete()
+
+    stats = ReconcileStats(len(created), len(updated), len(stale), len(rows) - len(created) - len(updated))
+    log.info(
+        f"🔄 {model.__name__}: {stats.created} created, {stats.updated} updated, "
+        f"{stats.deleted} deleted, {stats.unchanged} unchanged"
+    )
+    return stats
+
+
+def reconcile_reference_data(filters):
+    """
+    Apply a /getFilters payload to the reference tables, one reconcile() per
+    table. Cities go first so the districts' city ids resolve; a city only
+    known from a district's nested "city" object is created as well.
+    """
+    cities = {item["id"]: _named(City, item) for item in filters.get("cities", []) if item.get("id")}
+    for district in filters.get("districts", []):
+        city = district.get("city")
+        if isinstance(city, dict) and city.get("id") and city["id"] not in cities:
+            cities[city["id"]] = _named(City, city)
+
+    stats = {City: reconcile(City, cities)}
+    city_ids = set(City.objects.values_list("id", flat=True))
+
+    districts = {}
+    for district in filters.get("districts", []):
+        if not district.get("id"):
+            continue
+        city_id = district.get("city_id") or (district.get("city") or {}).get("id")
+        districts[district["id"]] = {
+            "name": district.get("name") or "Unnamed District",
+            "city_id": city_id if city_id in city_ids else None,
+        }
+    stats[District] = reconcile(District, districts)
+
+    for model, key in [
+        (DeveloperCompany, "developer_companies"),
+        (PropertyType, "property_types"),
+        (PropertyStatus, "property_statuses"),
+        (SalesStatus, "sales_statuses"),
+        (Facility, "facilities"),
+    ]:
+        rows = {item["id"]: _named(model, item) for item in filters.get(key, []) if item.get("id")}
+        stats[model] = reconcile(model, rows)
+    return stats
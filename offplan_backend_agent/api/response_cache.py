@@ -0,0 +1,89 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from api.data_versions import PROPERTY_DATA, REFERENCE_DATA, get_version
+
+CACHEABLE_METHODS = ("GET", "HEAD", "POST")
+
+
+def _normalized_body(request):
+    if request.method != "POST" or not request.body:
+        return ""
+    try:
+        return json.dumps(json.loads(request.body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return request.body.decode("utf-8", "replace")
+
+
+def response_cache_key(request):
+    """
+    Key a request on host, path, query string, Accept header, normalized JSON
+    body and the property and reference data versions. Accept is part of the
+    key because the browsable API renders the same URL as HTML for browsers and
+    JSON for clients.
+    """
+    query = sorted(request.GET.lists())
+    accept = request.META.get("HTTP_ACCEPT", "")
+    raw = json.dumps([request.get_host(), request.path, query, accept, _normalized_body(request)])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    method = "GET" if request.method == "HEAD" else request.method
+    return f"response:{get_version(PROPERTY_DATA)}.{get_version(REFERENCE_DATA)}:{method}:{digest}"
+
+
+def _etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    return etag in [tag.strip() for tag in header.split(",")] or header.strip() == "*"
+
+
+class CachedResponseMixin:
+    """
+    Serve successful responses of a read-only APIView from the cache.
+
+    Entries are keyed on the property and reference data versions, so they
+    are dropped as soon as an import or filter sync bumps either. Every response carries an ETag and
+    conditional requests with a matching If-None-Match get a 304.
+    """
+    cache_timeout = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in CACHEABLE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if hasattr(response, "render"):
+                response.render()
+            etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+            cached = (response.content, response["Content-Type"], etag)
+            timeout = self.cache_timeout or settings.RESPONSE_CACHE_TIMEOUT
+            cache.set(key, cached, timeout)
+            response["ETag"] = etag
+            response["X-Cache"] = "MISS"
+            patch_vary_headers(response, ("Accept",))
+            if _etag_matches(request, etag):
+                return self._not_modified(etag)
+            return response
+
+        content, content_type, etag = cached
+        if _etag_matches(request, etag):
+            return self._not_modified(etag)
+        response = HttpResponse(content, content_type=content_type)
+        response["ETag"] = etag
+        response["X-Cache"] = "HIT"
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def _not_modified(self, etag):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept",))
+        return response
@@ -0,0 +1,80 @@
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+
+from api.models import Property, GroupedApartment, PropertySearchDocument
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+DOCUMENT_FIELDS = [
+    "title",
+    "city_id", "district_id", "developer_id",
+    "property_type_id", "property_status_id", "sales_status_id",
+    "unit_types", "rooms",
+    "delivery_date", "low_price", "min_area", "updated_at",
+]
+
+
+def _build_documents(property_ids):
+    rows = Property.objects.filter(id__in=property_ids).values(
+        "id", "title", "delivery_date", "low_price", "min_area", "updated_at",
+        "city_id", "district_id", "developer_id",
+        "property_type_id", "property_status_id", "sales_status_id",
+    )
+
+    unit_types = defaultdict(list)
+    rooms = defaultdict(list)
+    grouped = GroupedApartment.objects.filter(property_id__in=property_ids).values_list(
+        "property_id", "unit_type", "rooms"
+    )
+    for property_id, unit_type, room in grouped:
+        if unit_type and unit_type not in unit_types[property_id]:
+            unit_types[property_id].append(unit_type)
+        if room and room not in rooms[property_id]:
+            rooms[property_id].append(room)
+
+    return [
+        PropertySearchDocument(
+            property_id=row["id"],
+            title=row["title"] or "",
+            city_id=row["city_id"],
+            district_id=row["district_id"],
+            developer_id=row["developer_id"],
+            property_type_id=row["property_type_id"],
+            property_status_id=row["property_status_id"],
+            sales_status_id=row["sales_status_id"],
+            unit_types="\n".join(unit_types[row["id"]]),
+            rooms=rooms[row["id"]],
+            delivery_date=row["delivery_date"],
+            low_price=row["low_price"],
+            min_area=row["min_area"],
+            updated_at=row["updated_at"],
+        )
+        for row in rows
+    ]
+
+
+def refresh_search_documents(property_ids=None):
+    """Rebuild the search documents of the given properties, or of every property when None."""
+    if property_ids is None:
+        property_ids = Property.objects.values_list("id", flat=True)
+    property_ids = list(property_ids)
+
+    refreshed = 0
+    for start in range(0, len(property_ids), CHUNK_SIZE):
+        chunk = property_ids[start:start + CHUNK_SIZE]
+        documents = _build_documents(chunk)
+        with transaction.atomic():
+            PropertySearchDocument.objects.bulk_create(
+                documents,
+                update_conflicts=True,
+                unique_fields=["property"],
+                update_fields=DOCUMENT_FIELDS,
+            )
+        refreshed += len(documents)
+
+    log.info(f"🔎 Refreshed {refreshed} property search documents")
+    return refreshed
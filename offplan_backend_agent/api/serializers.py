@@ -1,7 +1,7 @@
 from rest_framework import serializers
-from .models import AgentDetails, BlogPost, Property, PropertyUnit
+from .models import AgentDetails, BlogPost, Property
 from api.models import Property, City, District, DeveloperCompany, Consultation, Subscription, Contact, ReserveNow, RequestCallBack, AgentDetailsAdmin
-from django.db.models import Sum
+from api.fast_serializers import subunit_count_payload
 
 
 # class CitySerializer(serializers.ModelSerializer):
@@ -122,38 +122,12 @@ class PropertySerializer(serializers.ModelSerializer):
             "fa": obj.farsi_title or "",
         }
     def get_subunit_count(self, obj):
-        # Fetch the annotated count
+        # Prefer an annotated count, otherwise the stored rollup
         total_subunits = getattr(obj, "subunit_count", None)
         if total_subunits is None:
-            total_subunits = PropertyUnit.objects.filter(
-                property=obj
-            ).aggregate(total=Sum('unit_count'))['total'] or 0
-
-        # Format count and translated label
-        if total_subunits <= 1:
-            value = 1
-            label_en = "unit"
-            label_ar = "وحدة"
-            label_fa = "واحد"
-        elif total_subunits > 9:
-            value = "9+"
-            label_en = "units"
-            label_ar = "وحدات"
-            label_fa = "واحدها"
-        else:
-            value = total_subunits
-            label_en = "units"
-            label_ar = "وحدات"
-            label_fa = "واحدها"
+            total_subunits = obj.unit_count_total or 0
 
-        return {
-            "value": value,
-            "label": {
-                "en": label_en,
-                "ar": label_ar,
-                "fa": label_fa,
-            },
-        }
+        return subunit_count_payload(total_subunits)
 
     # def get_subunit_count(self, obj):
     #     request = self.context.get("request")
@@ -1,9 +1,55 @@
+import io
+import json
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.utils import timezone
+
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from django.contrib.auth.models import User
 from .models import AgentDetails  # adjust as needed
-from django.test import TestCase
+from .models import Property
+from django.test import SimpleTestCase, TestCase
+
+from api import jobs
+from api.estaty_client import EstatyClient, DetailFetcher
+from api.estaty_replay import FixtureStore, ReplayServer
+from api.fast_serializers import PROPERTY_LIST_PLAN, PROPERTY_BASIC_PLAN, serialize_properties
+from api.filter_stream import iter_json_array
+from api.fingerprints import changed_sections, fingerprint_payload
+from api.image_pipeline import ImagePipeline
+from api.import_runs import ImportCheckpoint
+from api.management.commands.import_property_unit import build_unit
+from api.management.commands.incremental_estaty_check import next_high_water_mark
+from api.management.commands.refresh_property_statuses import status_of
+from api.management.commands.translate_properties import pending_fields
+from api.models import (
+    BackgroundJob, City, DeveloperCompany, District, Facility, GroupedApartment, ImportRun, PaymentPlan,
+    PaymentPlanValue, PropertyUnit, SalesStatus, TranslationMemory,
+)
+from api.property_serializers import PropertyDetailSerializer
+from api.property_writer import PropertyBatchWriter
+from api.purge import purge_properties
+from api.query_plan import QueryBudget, serializer_query_plan
+from api.reference_sync import reconcile_reference_data
+from api.serializers import PropertySerializer, PropertyBasicSerializer
+from api.translation import (
+    BatchMismatch, FakeProvider, TranslationPipeline, TranslationUnavailable, split_sentences, translate_html,
+)
+from api.translation_state import source_md5
 
 class AgentViewTests(TestCase):
     def setUp(self):
@@ -78,3 +124,532 @@ class AgentViewTests(TestCase):
         response = self.client.delete(url)
         self.assertIn(response.status_code, [200, 204])
         self.assertFalse(AgentDetails.objects.filter(id=self.agent.id).exists())
+
+
+class PropertyDetailQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        city = City.objects.create(name="Dubai")
+        district = District.objects.create(name="Marina", city=city)
+        developer = DeveloperCompany.objects.create(name="Emaar", slug="emaar")
+        sales_status = SalesStatus.objects.create(name="On Sale")
+        self.prop = Property.objects.create(
+            title="Marina Heights", city=city, district=district,
+            developer=developer, sales_status=sales_status,
+        )
+        for facility_id in (1, 2):
+            self.prop.facilities.add(Facility.objects.create(id=facility_id, name=f"Facility {facility_id}"))
+        for i in range(5):
+            plan = PaymentPlan.objects.create(property=self.prop, name=f"Plan {i}", description="")
+            PaymentPlanValue.objects.create(property_payment_plan=plan, name="On Booking", value="20")
+            PaymentPlanValue.objects.create(property_payment_plan=plan, name="On Handover", value="80")
+
+    def test_query_plan_for_detail_serializer(self):
+        select, prefetch = serializer_query_plan(PropertyDetailSerializer)
+        self.assertEqual(set(select), {"city", "district", "developer", "sales_status"})
+        self.assertIn("payment_plans__values", prefetch)
+        self.assertIn("facilities", prefetch)
+
+    def test_property_detail_stays_within_query_budget(self):
+        # one property query with its joins, six prefetches and the data version lookup
+        with QueryBudget(8):
+            response = self.client.get(f"/api/property/{self.prop.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]["payment_plans"]), 5)
+
+
+class FastPropertySerializerTests(TestCase):
+    def setUp(self):
+        city = City.objects.create(name="Dubai", arabic_city_name="دبي")
+        district = District.objects.create(name="Marina", city=city)
+        developer = DeveloperCompany.objects.create(name="Emaar", slug="emaar", logo="developers/emaar.png")
+        Property.objects.create(
+            title="Marina Heights", arabic_title="مارينا", city=city, district=district,
+            developer=developer, cover="properties/cover.jpg", unit_count_total=12,
+            updated_at=datetime(2025, 3, 4, 5, 6, 7, 891011, tzinfo=dt_timezone.utc),
+        )
+        Property.objects.create(title="Bare Plot", unit_count_total=3)
+        Property.objects.create(title="")
+
+    def test_list_plan_matches_property_serializer(self):
+        request = APIRequestFactory().get("/api/properties/")
+        properties = list(Property.objects.all())
+        ids = [prop.id for prop in properties]
+
+        def as_json(data):
+            return JSONRenderer().render(data)
+
+        for req in (request, None):
+            expected = PropertySerializer(properties, many=True, context={"request": req}).data
+            self.assertEqual(as_json(serialize_properties(PROPERTY_LIST_PLAN, ids, req)), as_json(expected))
+
+        expected = PropertyBasicSerializer(properties, many=True).data
+        self.assertEqual(as_json(serialize_properties(PROPERTY_BASIC_PLAN, ids)), as_json(expected))
+
+    def test_updated_at_is_formatted_like_drf(self):
+        prop = Property.objects.get(title="Marina Heights")
+        [row] = serialize_properties(PROPERTY_LIST_PLAN, [prop.id], None)
+
+        self.assertEqual(row["updated_at"], "2025-03-04T05:06:07.891011Z")
+        self.assertEqual(row["updated_at"], PropertySerializer(prop, context={"request": None}).data["updated_at"])
+        self.assertIsNone(serialize_properties(PROPERTY_LIST_PLAN, [Property.objects.get(title="").id], None)[0]["updated_at"])
+
+
+class PropertyBatchWriterTests(TestCase):
+    def payload(self, prop_id, **overrides):
+        data = {
+            "id": prop_id,
+            "title": f"Tower {prop_id}",
+            "city": {"id": 1, "name": "Dubai"},
+            "district": {"id": 10, "name": "Marina"},
+            "developer_company": {"id": 100, "name": "Emaar"},
+            "property_type": {"id": 1, "name": "Apartment"},
+            "property_status": {"id": 1, "name": "Off Plan"},
+            "sales_status": {"id": 1, "name": "On Sale"},
+            "delivery_date": "06/2027",
+            "property_facilities": [{"facility": {"id": 7, "name": "Pool"}}, {"facility": {"id": 8, "name": "Gym"}}],
+            "grouped_apartments": [{"Unit_Type": "Apartment", "Rooms": "1 BR", "min_price": 1000000, "min_area": 700}],
+            "payment_plans": [{"name": "60/40", "values": [{"name": "On Booking", "value": "20"}]}],
+            "updated_at": "2025-01-01 10:00:00",
+        }
+        data.update(overrides)
+        return data
+
+    def test_flush_upserts_batch(self):
+        writer = PropertyBatchWriter(batch_size=2)
+        writer.add(self.payload(1))
+        writer.add(self.payload(2))  # fills the batch and flushes
+        writer.add(self.payload(1, title="Tower One", property_facilities=[{"facility": {"id": 7, "name": "Pool"}}]))
+        writer.flush()
+
+        self.assertEqual(writer.saved_ids, [1, 2, 1])
+        prop = Property.objects.get(id=1)
+        self.assertEqual(prop.title, "Tower One")
+        self.assertEqual(prop.delivery_date, 202706)
+        self.assertEqual(list(prop.facilities.values_list("id", flat=True)), [7])
+        self.assertEqual(District.objects.get(id=10).city_id, 1)
+        self.assertEqual(PaymentPlanValue.objects.filter(property_payment_plan__property_id=1).count(), 1)
+
+        # An identical payload is recognised by its fingerprint and not written again
+        writer.add(self.payload(2))
+        self.assertEqual(writer.flush(), [])
+        self.assertEqual(writer.skipped_ids, [2])
+
+    def test_changed_sections(self):
+        signed = fingerprint_payload(self.payload(1, cover="https://cdn/x/cover.jpg?sig=1"))
+        resigned = fingerprint_payload(self.payload(1, cover="https://cdn/x/cover.jpg?sig=2"))
+        self.assertEqual(changed_sections(resigned, signed), set())
+
+        before = fingerprint_payload(self.payload(1))
+        edited = self.payload(1, payment_plans=[{"name": "70/30", "values": [{"name": "On Booking", "value": "20"}]}])
+        self.assertEqual(changed_sections(fingerprint_payload(edited), before), {"plans"})
+
+
+class EstatyClientStubServerTests(SimpleTestCase):
+    """Runs EstatyClient and DetailFetcher against a local stub of the Estaty API."""
+
+    def setUp(self):
+        calls = self.calls = {"getProperty": 0, "flaky": 0}
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                if url.path.endswith("/getProperties"):
+                    page = int(parse_qs(url.query).get("page", ["1"])[0])
+                    ids = {1: [1, 2, 3], 2: [4, 5]}.get(page, [])
+                    return self.reply(200, {"properties": {"data": [{"id": i} for i in ids]}})
+                if url.path.endswith("/getProperty"):
+                    calls["getProperty"] += 1
+                    if body["id"] == 3 and calls["flaky"] == 0:
+                        calls["flaky"] += 1
+                        return self.reply(503, {})
+                    if body["id"] == 5:
+                        return self.reply(404, {})
+                    return self.reply(200, {"property": {"id": body["id"], "title": f"Tower {body['id']}"}})
+                self.reply(404, {})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v1"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetches_every_listed_property_concurrently(self):
+        client = EstatyClient(base_url=self.base_url, api_key="test", max_per_host=3, backoff=0, rate=1000)
+        results = dict(DetailFetcher(client, concurrency=3, queue_size=2).iter_details(client.iter_property_ids()))
+        metrics = client.metrics()
+        client.close()
+
+        self.assertEqual(set(results), {1, 2, 3, 4, 5})
+        self.assertEqual(results[3]["title"], "Tower 3")  # retried after the 503
+        self.assertIsNone(results[5])  # a 404 is reported, not retried
+        self.assertEqual(self.calls["getProperty"], 6)
+        self.assertEqual((metrics["requests"], metrics["failures"]), (8, 1))  # 3 listing pages + 5 details
+        self.assertLess(metrics["rate"], 1000)  # the 503 slowed the pacing down
+
+    def test_cached_posts_skip_the_network(self):
+        client = EstatyClient(base_url=self.base_url, api_key="test", backoff=0)
+        first = client.post("getProperty", {"id": 1}, cache_ttl=60)
+        first["property"]["title"] = "changed by the caller"
+        second = client.post("getProperty", {"id": 1}, cache_ttl=60)
+        client.close()
+
+        self.assertEqual(second["property"]["title"], "Tower 1")
+        self.assertEqual(self.calls["getProperty"], 1)
+        self.assertEqual(client.metrics()["cache_hits"], 1)
+
+
+class EstatyReplayTests(SimpleTestCase):
+    def test_replays_recorded_calls_with_injected_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FixtureStore(directory)
+            store.save("getProperties", "", b"{}", 200, b'{"properties": {"data": [{"id": 7}]}}')
+            store.save("getProperty", "", b'{"id": 7}', 200, b'{"property": {"id": 7, "cover": "https:\\/\\/cdn.example\\/a.jpg"}}')
+
+            with ReplayServer(store, error_rate=0.3, seed=3) as server:
+                client = EstatyClient(base_url=server.base_url, api_key="test", backoff=0)
+                ids = list(client.iter_property_ids())
+                detail = client.get_property(7)
+                client.close()
+
+        self.assertEqual(ids, [7])
+        self.assertTrue(detail["cover"].startswith(f"{server.url}/media/"))
+        self.assertGreater(server.errors_injected, 0)  # retried by the client
+        self.assertEqual(server.missing, 1)  # page 2 of the listing
+
+
+class ImagePipelineTests(SimpleTestCase):
+    def test_identical_bytes_stored_once_and_304_reuses_file(self):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = b"same image bytes"
+                self.send_response(200)
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+        pipeline = ImagePipeline(concurrency=2, storage=storage)
+        first = pipeline._fetch(f"{base}/a/cover.jpg?sig=1", "property_covers/", None)
+        second = pipeline._fetch(f"{base}/b/other.jpg", "property_covers/", None)
+        self.assertEqual(first.storage_name, second.storage_name)
+        self.assertEqual(len(storage.listdir("property_covers")[1]), 1)
+
+        Known = namedtuple("Known", "etag last_modified content_hash storage_name")
+        known = Known('"v1"', "", first.content_hash, first.storage_name)
+        self.assertEqual(pipeline._fetch(f"{base}/a/cover.jpg", "property_covers/", known).storage_name, first.storage_name)
+
+    def test_only_groups_with_every_image_stored_are_reported(self):
+        reported = []
+        pipeline = ImagePipeline(on_stored=reported.extend)
+        self.addCleanup(pipeline.close)
+
+        pipeline._groups = {1: [2, True], 2: [1, True]}
+        pipeline._settle(1, True)
+        pipeline._settle(1, False)
+        pipeline._settle(2, True)
+        pipeline.add([], group=3)  # nothing to download
+        pipeline.apply()
+
+        self.assertEqual(reported, [2, 3])
+
+
+class FilterStreamTests(SimpleTestCase):
+    def test_items_survive_any_chunking(self):
+        data = {
+            "status": True,
+            "count": 1234,
+            "properties": [{"id": i, "title": f"برج {i}", "apartment": [{"price": 1.5e6, "sold": None}] * (i % 3)} for i in range(50)],
+            "meta": {"pages": [1, 2]},
+        }
+        raw = json.dumps(data, ensure_ascii=False).encode()
+        for size in (1, 13, 4096):
+            chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+            self.assertEqual(list(iter_json_array(chunks)), data["properties"])
+        self.assertEqual(list(iter_json_array([b'{"properties": []}'])), [])
+
+
+class PurgePropertiesTests(TestCase):
+    def test_purge_removes_property_tree_only(self):
+        keep = Property.objects.create(title="Keep")
+        gone = Property.objects.create(title="Gone")
+        gone.facilities.add(Facility.objects.create(id=1, name="Pool"))
+        for prop in (keep, gone):
+            plan = PaymentPlan.objects.create(property=prop, name="60/40", description="")
+            PaymentPlanValue.objects.create(property_payment_plan=plan, name="On Booking", value="20")
+            GroupedApartment.objects.create(property=prop, unit_type="Apartment", rooms="1 BR")
+            PropertyUnit.objects.create(id=prop.id * 10, property=prop, created_at=timezone.now(), updated_at=timezone.now())
+
+        stats = purge_properties([gone.id])
+
+        self.assertEqual(list(Property.objects.values_list("id", flat=True)), [keep.id])
+        self.assertEqual(PaymentPlanValue.objects.count(), 1)
+        self.assertEqual(PropertyUnit.objects.get().property_id, keep.id)
+        self.assertEqual(Property.facilities.through.objects.count(), 0)
+        self.assertEqual(stats[Property._meta.db_table][0], 1)
+
+
+class ImportCheckpointTests(SimpleTestCase):
+    def test_pages_commit_in_order(self):
+        checkpoint = ImportCheckpoint(ImportRun(last_completed_page=2, completed_ids=[7]))
+        self.assertEqual(checkpoint.start_page, 3)
+
+        checkpoint.page_listed(3, [5, 6, 7])
+        checkpoint.page_listed(4, [8])
+        checkpoint.commit([8])
+        self.assertEqual(checkpoint.run.last_completed_page, 2)  # page 3 still has 5 and 6 open
+
+        checkpoint.commit([5, 6])
+        self.assertEqual(checkpoint.run.last_completed_page, 4)
+        self.assertTrue(checkpoint.is_committed(7))
+        self.assertEqual(checkpoint.listed, {5, 6, 7, 8})
+
+
+class ReferenceSyncTests(TestCase):
+    def test_reconcile_applies_only_the_difference(self):
+        City.objects.create(id=1, name="Dubai", arabic_city_name="دبي")
+        City.objects.create(id=2, name="Old name")
+        City.objects.create(id=3, name="Gone")
+        City.objects.create(id=4, name="Gone but used")
+        Property.objects.create(title="Tower", city_id=4)
+
+        stats = reconcile_reference_data({
+            "cities": [{"id": 1, "name": "Dubai"}, {"id": 2, "name": "Abu Dhabi"}, {"id": 5, "name": "Sharjah"}],
+            "districts": [{"id": 10, "name": "Marina", "city_id": 1}, {"id": 11, "name": "Nowhere", "city_id": 99}],
+        })
+
+        self.assertEqual(tuple(stats[City]), (1, 1, 1, 1))
+        self.assertEqual(dict(City.objects.values_list("id", "name")), {1: "Dubai", 2: "Abu Dhabi", 4: "Gone but used", 5: "Sharjah"})
+        self.assertEqual(City.objects.get(id=1).arabic_city_name, "دبي")
+        self.assertEqual(dict(District.objects.values_list("id", "city_id")), {10: 1, 11: None})
+
+
+class PropertyStatusRefreshTests(SimpleTestCase):
+    def test_status_of_reads_filter_and_detail_payloads(self):
+        self.assertEqual(status_of({"property_status_id": 3, "property_status": {"id": 3, "name": "Ready"}}), (3, "Ready"))
+        self.assertEqual(status_of({"property_status": {"id": 4, "name": "Off Plan"}}), (4, "Off Plan"))
+        self.assertEqual(status_of({"property_status": None}), (None, None))
+
+
+class TranslationPipelineTests(SimpleTestCase):
+    def test_batches_dedupe_and_retry(self):
+        class FlakyProvider(FakeProvider):
+            max_batch_items = 2
+            failed = False
+
+            def translate_batch(self, texts, target):
+                if not self.failed:
+                    self.failed = True
+                    raise RuntimeError("429")
+                return super().translate_batch(texts, target)
+
+        pipeline = TranslationPipeline(FlakyProvider(latency=0), concurrency=1, rate=100, retries=1)
+        with mock.patch("api.translation.time.sleep") as sleep, mock.patch.object(pipeline.bucket, "acquire"):
+            result = pipeline.translate(["Pool", "Gym", "Pool", "", "Spa"], "ar")
+
+        self.assertEqual(result, {"Pool": "[ar] Pool", "Gym": "[ar] Gym", "Spa": "[ar] Spa"})
+        self.assertEqual(pipeline.calls, 3)  # two batches plus one retry
+        sleep.assert_called_once_with(1)
+        self.assertLess(pipeline.bucket.rate, 100)
+
+    def test_only_mismatched_batches_are_split(self):
+        class MergingProvider(FakeProvider):
+            def translate_batch(self, texts, target):
+                if len(texts) > 1 and "Gym" in texts:
+                    raise BatchMismatch("lines merged")
+                return super().translate_batch(texts, target)
+
+        pipeline = TranslationPipeline(MergingProvider(latency=0), concurrency=1, rate=100, retries=0)
+        with mock.patch("api.translation.time.sleep") as sleep:
+            result = pipeline.translate(["Spa", "Gym", "Pool", "Park"], "ar")
+
+        self.assertEqual(result, {text: f"[ar] {text}" for text in ["Spa", "Gym", "Pool", "Park"]})
+        self.assertEqual(pipeline.failures, 0)
+        sleep.assert_not_called()
+
+    def test_consecutive_failures_abort_the_run(self):
+        class DownProvider(FakeProvider):
+            max_batch_items = 1
+
+            def translate_batch(self, texts, target):
+                raise RuntimeError("503")
+
+        pipeline = TranslationPipeline(DownProvider(latency=0), concurrency=1, rate=100, retries=1,
+                                       max_consecutive_failures=3)
+        with mock.patch("api.translation.time.sleep"), mock.patch.object(pipeline.bucket, "acquire"), \
+                self.assertRaises(TranslationUnavailable):
+            pipeline.translate([f"Tower {i}" for i in range(10)], "ar")
+
+        self.assertEqual(pipeline.calls, 3)
+
+    def test_long_text_is_split_at_sentences(self):
+        self.assertEqual(split_sentences("One. Two! Three?", 10), ["One. Two!", "Three?"])
+        self.assertEqual(split_sentences("abcdefghij", 4), ["abcd", "efgh", "ij"])
+
+
+class TranslationMemoryTests(TestCase):
+    def test_repeated_text_is_translated_once(self):
+        first = TranslationPipeline(FakeProvider(latency=0), rate=100, memory=True)
+        first.translate(["On Booking", "Gym"], "ar")
+        self.assertEqual(first.calls, 1)
+
+        second = TranslationPipeline(FakeProvider(latency=0), rate=100, memory=True)
+        result = second.translate(["On  Booking", "Gym", "Pool"], "ar")
+
+        self.assertEqual(result["On  Booking"], "[ar] On Booking")
+        self.assertEqual(second.memory_hits, 2)
+        self.assertEqual(second.chars, len("Pool"))
+        self.assertEqual(TranslationMemory.objects.filter(language="ar").count(), 3)
+
+
+class IncrementalTranslationTests(SimpleTestCase):
+    def test_only_empty_or_changed_targets_are_pending(self):
+        fields = {"name": {"ar": "arabic_city_name", "fa": "farsi_city_name"}}
+        city = City(id=1, name="Dubai Marina", arabic_city_name="دبي مارينا", farsi_city_name="")
+
+        self.assertEqual([t for _, _, t, _ in pending_fields(city, fields, {})], ["farsi_city_name"])
+
+        hashes = {(1, "arabic_city_name"): source_md5("Dubai")}
+        self.assertEqual([t for _, _, t, _ in pending_fields(city, fields, hashes)], ["arabic_city_name", "farsi_city_name"])
+
+        hashes = {(1, "arabic_city_name"): source_md5("Dubai Marina")}
+        self.assertEqual([t for _, _, t, _ in pending_fields(city, fields, hashes)], ["farsi_city_name"])
+        self.assertEqual(len(pending_fields(city, fields, hashes, everything=True)), 2)
+
+
+class BackgroundJobTests(TestCase):
+    def test_failed_jobs_are_retried_then_given_up(self):
+        calls = []
+
+        @jobs.job("test_flaky")
+        def flaky(queued):
+            calls.append(queued.attempts)
+            raise RuntimeError("provider down")
+
+        self.addCleanup(jobs.HANDLERS.pop, "test_flaky")
+        jobs.enqueue("test_flaky", max_attempts=2, value=1)
+        [queued] = jobs.claim(5)
+        self.assertEqual(jobs.run(queued), "pending")
+        self.assertEqual(jobs.claim(5), [])  # backing off
+
+        queued.refresh_from_db()
+        queued.run_after = queued.created_at
+        queued.save()
+        [queued] = jobs.claim(5)
+        self.assertEqual(jobs.run(queued), "failed")
+        self.assertEqual(calls, [1, 2])
+        self.assertIn("provider down", queued.error)
+
+    def test_outcome_is_dropped_once_the_job_was_requeued(self):
+        @jobs.job("test_slow")
+        def slow(queued):
+            # Meanwhile another worker finds the job stale and claims it again
+            BackgroundJob.objects.filter(pk=queued.pk).update(locked_at=queued.locked_at + timedelta(minutes=20))
+
+        self.addCleanup(jobs.HANDLERS.pop, "test_slow")
+        jobs.enqueue("test_slow")
+        [queued] = jobs.claim(5)
+
+        self.assertEqual(jobs.run(queued), "lost")
+        self.assertEqual(BackgroundJob.objects.get(pk=queued.pk).status, "running")
+
+
+class HtmlTranslationTests(SimpleTestCase):
+    def test_markup_is_kept_and_text_nodes_translated(self):
+        pipeline = TranslationPipeline(FakeProvider(latency=0), rate=100)
+        content, missing = translate_html(
+            pipeline,
+            '<h2>Why Dubai?</h2>\n<p>Prices <strong>rose</strong> again.</p>'
+            '<img src="a.jpg" alt="Marina"><pre>keep  me</pre>',
+            "fa",
+        )
+
+        self.assertEqual(missing, 0)
+        self.assertEqual(
+            content,
+            '<h2>[fa] Why Dubai?</h2>\n<p>[fa] Prices <strong>[fa] rose</strong> [fa] again.</p>'
+            '<img alt="[fa] Marina" src="a.jpg"/><pre>keep  me</pre>',
+        )
+
+
+class DeltaSyncHighWaterMarkTests(SimpleTestCase):
+    def test_mark_only_advances_past_fully_written_changes(self):
+        mark = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        newest = datetime(2025, 1, 5, tzinfo=dt_timezone.utc)
+        failed = datetime(2025, 1, 3, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(next_high_water_mark(mark, newest, True, []), newest)
+        self.assertEqual(next_high_water_mark(mark, newest, False, []), mark)
+        self.assertEqual(next_high_water_mark(mark, newest, True, [failed, newest]), failed - timedelta(microseconds=1))
+        # A failed item older than the current mark pulls the mark back so the walk reaches it
+        self.assertLess(next_high_water_mark(newest, newest, True, [failed]), failed)
+
+
+class DeltaSyncDeletionTests(TestCase):
+    def test_properties_gone_upstream_are_purged(self):
+        class GoneClient:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def latest_updated_properties(self):
+                return []
+
+            def get_properties(self, page):
+                return []
+
+            def get_property(self, prop_id):
+                if prop_id == 2:
+                    raise requests.ConnectionError("timeout")
+                return None
+
+            def summary(self):
+                return "stub"
+
+        Property.objects.create(id=1, title="Gone")
+        Property.objects.create(id=2, title="Unreachable")
+
+        with mock.patch("api.management.commands.incremental_estaty_check.EstatyClient", GoneClient), \
+                redirect_stdout(io.StringIO()):
+            call_command("incremental_estaty_check", probe=2, stdout=io.StringIO())
+
+        self.assertEqual(list(Property.objects.values_list("id", flat=True)), [2])
+
+
+class UnitNormalizationTests(SimpleTestCase):
+    def test_raw_api_values_match_stored_types(self):
+        unit = build_unit("7", {
+            "id": 70, "apartment_id": "12", "area": "120.5", "price": "1500000", "apt_no": 1204,
+            "created_at": "2025-01-02 03:04:05", "updated_at": "2025-01-02T03:04:05Z",
+        })
+
+        self.assertEqual((unit.property_id, unit.apartment_id, unit.area, unit.price, unit.apt_no), (7, 12, 120.5, 1500000.0, "1204"))
+        self.assertEqual(unit.created_at, datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc))
+        self.assertEqual(unit.updated_at, unit.created_at)
@@ -0,0 +1,344 @@
+import html
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup, NavigableString
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PROVIDER = os.getenv("TRANSLATION_PROVIDER", "google")
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 5.0  # provider calls per second
+DEFAULT_RETRIES = 3
+# Consecutive failed provider calls after which the run is aborted
+DEFAULT_MAX_CONSECUTIVE_FAILURES = 8
+BATCH_SEPARATOR = "\n"
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Text under these tags is code or markup, never prose
+UNTRANSLATED_TAGS = {"script", "style", "code", "pre", "noscript"}
+TRANSLATED_ATTRIBUTES = ("alt", "title")
+
+
+def clean_text(text):
+    # Remove HTML tags
+    soup = BeautifulSoup(text, "html.parser")
+    stripped = soup.get_text(separator=" ", strip=True)
+
+    # Unescape HTML entities like &nbsp;, &rsquo;
+    unescaped = html.unescape(stripped)
+
+    # Normalize whitespace
+    cleaned = ' '.join(unescaped.split())
+
+    return cleaned
+
+
+def split_sentences(text, limit):
+    """`text` cut at sentence ends into pieces of at most `limit` chars (hard cuts for run-on sentences)."""
+    if len(text) <= limit:
+        return [text]
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(text):
+        while len(sentence) > limit:
+            pieces.append(sentence[:limit])
+            sentence = sentence[limit:]
+        if current and len(current) + len(sentence) + 1 > limit:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class BatchMismatch(Exception):
+    """The provider answered, but not with one translation per string."""
+
+
+class TranslationUnavailable(Exception):
+    """Too many provider calls failed in a row; the provider is treated as down."""
+
+
+# --------------- PROVIDERS -----------------------
+
+class TranslationProvider:
+    """
+    Translates batches of single-line strings into one target language.
+    `max_batch_chars` / `max_batch_items` bound one translate_batch() call;
+    only `cacheable` providers have their output kept in translation memory.
+    """
+
+    name = None
+    cacheable = True
+    max_batch_chars = 4500
+    max_batch_items = 100
+
+    def translate_batch(self, texts, target):
+        raise NotImplementedError
+
+
+class GoogleProvider(TranslationProvider):
+    """
+    deep_translator's GoogleTranslator, which takes one string per request:
+    a batch is sent as one newline-joined text and split back. clean_text()
+    leaves no newlines inside a string, so lines map 1:1; if the answer comes
+    back with a different line count, BatchMismatch lets the pipeline split it.
+    A string over the size limit travels alone and is sent sentence by sentence.
+    """
+
+    name = "google"
+
+    def translate_batch(self, texts, target):
+        from deep_translator import GoogleTranslator
+
+        translator = GoogleTranslator(source="auto", target=target)
+        if len(texts) == 1:
+            return [" ".join(translator.translate(piece) for piece in split_sentences(texts[0], self.max_batch_chars))]
+        lines = translator.translate(BATCH_SEPARATOR.join(texts)).split(BATCH_SEPARATOR)
+        if len(lines) != len(texts):
+            raise BatchMismatch(f"{len(texts)} strings came back as {len(lines)} lines")
+        return [line.strip() for line in lines]
+
+
+class FakeProvider(TranslationProvider):
+    """Offline provider for tests and benchmarks: tags each string with its language after `latency` seconds."""
+
+    name = "fake"
+    cacheable = False
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+
+    def translate_batch(self, texts, target):
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"[{target}] {text}" for text in texts]
+
+
+PROVIDERS = {provider.name: provider for provider in (GoogleProvider, FakeProvider)}
+
+
+def get_provider(name=None):
+    try:
+        return PROVIDERS[name or DEFAULT_PROVIDER]()
+    except KeyError:
+        raise ValueError(f"Unknown translation provider {name!r}; choose from {', '.join(PROVIDERS)}")
+
+
+# --------------- RATE LIMITING -----------------------
+
+class TokenBucket:
+    """
+    Token bucket shared by the translation workers: up to `capacity` calls
+    back to back, refilled at `rate` per second. The rate halves whenever
+    the provider pushes back and grows again by `recovery` per success, up
+    to `max_rate`.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=None, min_rate=0.2, max_rate=None, recovery=0.1):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.recovery = recovery
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                current = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (current - self.updated) * self.rate)
+                self.updated = current
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+
+# --------------- PIPELINE -----------------------
+
+class TranslationPipeline:
+    """
+    Translates many strings at once: identical strings are sent once and
+    strings found in translation memory not at all, the rest are packed into
+    provider-sized batches and translated on `concurrency` threads under a
+    TokenBucket, which callers running several pipelines at once can share
+    through `bucket`.
+
+    A failing call is retried with backoff, `retries` times per batch; a
+    batch that still fails is left out of the result. A batch the provider
+    answered with the wrong number of strings is split in halves, which share
+    the remaining retries. After `max_consecutive_failures` failed calls in a
+    row every worker stops and translate() raises TranslationUnavailable.
+    """
+
+    def __init__(self, provider=None, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, retries=DEFAULT_RETRIES,
+                 memory=None, max_consecutive_failures=DEFAULT_MAX_CONSECUTIVE_FAILURES, bucket=None):
+        self.provider = provider or get_provider()
+        self.concurrency = concurrency
+        self.bucket = bucket or TokenBucket(rate)
+        self.retries = retries
+        self.max_consecutive_failures = max_consecutive_failures
+        self.memory = self.provider.cacheable if memory is None else memory
+        self.memory_hits = 0
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.chars = 0
+        self._stats_lock = threading.Lock()
+
+    def batches(self, texts):
+        batch, size = [], 0
+        for text in texts:
+            if BATCH_SEPARATOR in text:
+                # Multi-line text can't share a newline-joined request
+                yield [text]
+                continue
+            if batch and (len(batch) >= self.provider.max_batch_items
+                          or size + len(text) + 1 > self.provider.max_batch_chars):
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text) + 1
+        if batch:
+            yield batch
+
+    def _check_circuit(self):
+        if self.consecutive_failures >= self.max_consecutive_failures:
+            raise TranslationUnavailable(
+                f"{self.provider.name} failed {self.consecutive_failures} calls in a row; giving up"
+            )
+
+    def _attempt(self, texts, target):
+        self._check_circuit()
+        self.bucket.acquire()
+        with self._stats_lock:
+            self.calls += 1
+            self.chars += sum(len(text) for text in texts)
+        translated = self.provider.translate_batch(texts, target)
+        if len(translated) != len(texts):
+            raise BatchMismatch(f"{len(texts)} strings came back as {len(translated)}")
+        return dict(zip(texts, translated))
+
+    def _call(self, texts, target, budget=None):
+        """
+        {text: translation} for one batch. `budget` is a one-item list of the
+        failed attempts still allowed, shared with the halves of a split batch.
+        """
+        budget = budget if budget is not None else [self.retries]
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt(texts, target)
+            except BatchMismatch as e:
+                # The provider is up, the batch just didn't survive the round trip
+                with self._stats_lock:
+                    self.consecutive_failures = 0
+                log.warning(f"⚠️ {target} batch of {len(texts)} split in halves: {e}")
+                middle = len(texts) // 2
+                if not middle:
+                    return {}
+                return {**self._call(texts[:middle], target, budget), **self._call(texts[middle:], target, budget)}
+            except TranslationUnavailable:
+                raise
+            except Exception as e:
+                with self._stats_lock:
+                    self.failures += 1
+                    self.consecutive_failures += 1
+                self.bucket.throttled()
+                log.warning(f"⚠️ {target} batch of {len(texts)} failed (attempt {attempt + 1}): {e}")
+                if budget[0] <= 0:
+                    log.error(f"❌ Could not translate {len(texts)} strings to {target}, starting with {texts[0][:80]!r}")
+                    return {}
+                budget[0] -= 1
+                time.sleep(min(2 ** attempt, 30))
+                attempt += 1
+                continue
+            with self._stats_lock:
+                self.consecutive_failures = 0
+            self.bucket.succeeded()
+            return result
+
+    def translate(self, texts, target):
+        """{text: translation} for the non-empty strings of `texts` into `target`."""
+        unique = sorted({text for text in texts if text and text.strip()}, key=len)
+        if not unique:
+            return {}
+        result = {}
+        if self.memory:
+            from api import translation_memory
+
+            result = translation_memory.lookup(unique, target)
+            self.memory_hits += len(result)
+            unique = [text for text in unique if text not in result]
+
+        fresh = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="translate") as executor:
+            for translated in executor.map(lambda batch: self._call(batch, target), self.batches(unique)):
+                fresh.update(translated)
+        if self.memory:
+            translation_memory.remember({text: value for text, value in fresh.items() if value}, target, self.provider.name)
+        result.update(fresh)
+        return result
+
+    def summary(self):
+        return f"{self.memory_hits} from translation memory, {self.calls} provider calls ({self.failures} failed), {self.chars} chars, pacing at {self.bucket.rate:.1f} calls/s"
+
+
+# --------------- HTML -----------------------
+
+def translate_html(pipeline, content, target):
+    """
+    Translate the prose of an HTML fragment without touching its markup.
+
+    Every text node (and alt/title attribute) becomes one segment; all
+    segments go through `pipeline` together, so a long article is just many
+    small batched, parallel, memory-backed strings rather than one request
+    over the provider's size limit. The translations are put back into the
+    same nodes, keeping the DOM as it was. Returns (html, untranslated
+    segment count); untranslated segments keep their original text.
+    """
+    soup = BeautifulSoup(content or "", "html.parser")
+    nodes = [
+        node for node in soup.find_all(string=True)
+        if type(node) is NavigableString and node.strip()
+        and not any(parent.name in UNTRANSLATED_TAGS for parent in node.parents)
+    ]
+    attributes = [
+        (tag, name) for tag in soup.find_all(True) for name in TRANSLATED_ATTRIBUTES
+        if isinstance(tag.get(name), str) and tag[name].strip()
+    ]
+
+    segments = [" ".join(node.split()) for node in nodes] + [" ".join(tag[name].split()) for tag, name in attributes]
+    translated = pipeline.translate(segments, target)
+
+    missing = 0
+    for node, segment in zip(nodes, segments):
+        if segment not in translated:
+            missing += 1
+            continue
+        leading = node[:len(node) - len(node.lstrip())]
+        trailing = node[len(node.rstrip()):]
+        node.replace_with(NavigableString(f"{leading}{translated[segment]}{trailing}"))
+    for (tag, name), segment in zip(attributes, segments[len(nodes):]):
+        if segment not in translated:
+            missing += 1
+            continue
+        tag[name] = translated[segment]
+    return str(soup), missing
@@ -0,0 +1,52 @@
+import hashlib
+import logging
+
+from api.models import TranslationMemory
+
+log = logging.getLogger(__name__)
+
+LOOKUP_CHUNK = 1000
+
+
+def normalize(text):
+    return " ".join(text.split())
+
+
+def source_hash(text):
+    return hashlib.sha256(normalize(text).encode()).hexdigest()
+
+
+def lookup(texts, language):
+    """{text: stored translation} for the `texts` already translated into `language`."""
+    by_hash = {}
+    for text in texts:
+        by_hash.setdefault(source_hash(text), []).append(text)
+
+    found = {}
+    hashes = list(by_hash)
+    for i in range(0, len(hashes), LOOKUP_CHUNK):
+        rows = TranslationMemory.objects.filter(
+            language=language, source_hash__in=hashes[i:i + LOOKUP_CHUNK],
+        ).values_list("source_hash", "translation")
+        for digest, translation in rows:
+            for text in by_hash[digest]:
+                found[text] = translation
+    return found
+
+
+def remember(translations, language, provider):
+    """Store {text: translation} for `language`; texts already remembered keep their first translation."""
+    if not translations:
+        return
+    TranslationMemory.objects.bulk_create(
+        [
+            TranslationMemory(
+                source_hash=source_hash(text), language=language, source=normalize(text),
+                translation=translation, provider=provider,
+            )
+            for text, translation in translations.items()
+        ],
+        ignore_conflicts=True,
+        batch_size=LOOKUP_CHUNK,
+    )
+    log.debug(f"🧠 Remembered {len(translations)} {language} translations")
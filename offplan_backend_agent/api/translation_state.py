@@ -0,0 +1,59 @@
+import hashlib
+from functools import reduce
+from operator import or_
+
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import MD5
+
+from api.models import TranslationState
+
+STATE_BATCH_SIZE = 1000
+
+
+def source_md5(value):
+    """Same digest as Postgres md5(): hex MD5 of the UTF-8 source text."""
+    return hashlib.md5((value or "").encode()).hexdigest()
+
+
+def _empty(field):
+    return Q(**{f"{field}__isnull": True}) | Q(**{field: ""})
+
+
+def stale_filter(model, fields):
+    """
+    Q selecting the rows of `model` with a target column to (re)translate:
+    its source is set and the target is empty, or the source no longer
+    hashes to what the target was last translated from. Everything is
+    evaluated in SQL against the unique (model_label, object_id, field)
+    index, so an unchanged table costs one scan and no Python work.
+    """
+    label = model._meta.label_lower
+    conditions = []
+    for source, targets in fields.items():
+        changed = [
+            Exists(
+                TranslationState.objects.filter(model_label=label, object_id=OuterRef("pk"), field=target)
+                .exclude(source_hash=MD5(OuterRef(source)))
+            )
+            for target in targets.values()
+        ]
+        conditions.append(~_empty(source) & (reduce(or_, [_empty(t) for t in targets.values()]) | reduce(or_, changed)))
+    return reduce(or_, conditions)
+
+
+def stored_hashes(model, pks):
+    """{(object id, target field): source hash} recorded for `pks`."""
+    rows = TranslationState.objects.filter(model_label=model._meta.label_lower, object_id__in=pks)
+    return {(object_id, field): digest for object_id, field, digest in rows.values_list("object_id", "field", "source_hash")}
+
+
+def record(model, entries):
+    """Upsert [(object id, target field, source hash)] after translating them."""
+    label = model._meta.label_lower
+    TranslationState.objects.bulk_create(
+        [TranslationState(model_label=label, object_id=pk, field=field, source_hash=digest) for pk, field, digest in entries],
+        update_conflicts=True,
+        unique_fields=["model_label", "object_id", "field"],
+        update_fields=["source_hash", "translated_at"],
+        batch_size=STATE_BATCH_SIZE,
+    )
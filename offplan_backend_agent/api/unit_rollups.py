@@ -0,0 +1,52 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Sum, Min, Max
+
+from api.models import Property, PropertyUnit
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+ROLLUP_FIELDS = ["unit_count_total", "unit_min_price", "unit_max_price", "unit_min_area", "unit_max_area"]
+
+
+def refresh_unit_rollups(property_ids=None):
+    """Recompute the stored unit rollups of the given properties, or of every property when None."""
+    if property_ids is None:
+        property_ids = Property.objects.values_list("id", flat=True)
+    property_ids = list(set(property_ids))
+
+    refreshed = 0
+    for start in range(0, len(property_ids), CHUNK_SIZE):
+        chunk = property_ids[start:start + CHUNK_SIZE]
+        totals = {
+            row["property_id"]: row
+            for row in PropertyUnit.objects.filter(property_id__in=chunk)
+            .values("property_id")
+            .annotate(
+                count=Sum("unit_count"),
+                min_price=Min("price"),
+                max_price=Max("price"),
+                min_area=Min("area"),
+                max_area=Max("area"),
+            )
+            .order_by()
+        }
+
+        properties = list(Property.objects.filter(id__in=chunk).only("id", *ROLLUP_FIELDS))
+        for prop in properties:
+            row = totals.get(prop.id, {})
+            prop.unit_count_total = row.get("count") or 0
+            prop.unit_min_price = row.get("min_price")
+            prop.unit_max_price = row.get("max_price")
+            prop.unit_min_area = row.get("min_area")
+            prop.unit_max_area = row.get("max_area")
+
+        with transaction.atomic():
+            Property.objects.bulk_update(properties, ROLLUP_FIELDS, batch_size=500)
+        refreshed += len(properties)
+
+    log.info(f"📊 Refreshed unit rollups for {refreshed} properties")
+    return refreshed
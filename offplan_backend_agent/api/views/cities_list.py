@@ -3,9 +3,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from api.models import City
 from api.serializers import CitySerializerWithDistricts
+from api.response_cache import CachedResponseMixin
 from rest_framework.permissions import AllowAny
 
-class CityListView(APIView):
+class CityListView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
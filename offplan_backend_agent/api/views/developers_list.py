@@ -3,9 +3,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from api.models import DeveloperCompany
 from api.serializers import DeveloperCompanySerializer
+from api.response_cache import CachedResponseMixin
 from rest_framework.permissions import AllowAny
 
-class DeveloperListView(APIView):
+class DeveloperListView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
@@ -3,10 +3,19 @@ from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.urls import reverse
+from django.core.cache import cache
+from django.db.models import Q
+from datetime import datetime
+import base64
+import hashlib
+import json
 from api.models import Property
-from api.serializers import PropertySerializer, PropertyBasicSerializer
-from django.db.models import Sum
+from api.data_versions import PROPERTY_DATA, get_version
+from api.fast_serializers import PROPERTY_LIST_PLAN, PROPERTY_BASIC_PLAN, serialize_rows, serialize_properties
+from api.response_cache import CachedResponseMixin
 
 
 class CustomPagination(PageNumberPagination):
@@ -30,19 +39,142 @@ class CustomPagination(PageNumberPagination):
         })
 
 
-class PropertyListView(APIView):
+class KeysetPagination:
+    """
+    Opt-in cursor pagination keyed on (updated_at, id), newest first.
+
+    Enabled with ?paginate=cursor (or whenever a ?cursor= is sent). Pages are
+    fetched with a WHERE on the last row seen instead of COUNT(*) + OFFSET, so
+    deep pages cost the same as the first one. The total is only computed when
+    ?with_count=true is passed, and is then cached for COUNT_CACHE_TIMEOUT.
+    The response keeps the CustomPagination envelope; current_page is None.
+    """
+    cursor_query_param = "cursor"
+    mode_query_param = "paginate"
+    count_query_param = "with_count"
+    COUNT_CACHE_TIMEOUT = 300
+
+    def __init__(self, page_size=12, id_field="id", updated_field="updated_at"):
+        self.page_size = page_size
+        self.id_field = id_field
+        self.updated_field = updated_field
+
+    @classmethod
+    def requested(cls, request):
+        return request.query_params.get(cls.mode_query_param) == "cursor" or cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        self.count = self._get_count(queryset) if self._count_requested() else None
+
+        position, reverse = self._decode_cursor(request.query_params.get(self.cursor_query_param))
+        u, i = self.updated_field, self.id_field
+        if reverse:
+            queryset = queryset.order_by(u, i)
+        else:
+            queryset = queryset.order_by(f"-{u}", f"-{i}")
+        if position is not None:
+            queryset = queryset.filter(self._seek(*position, reverse=reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None and (has_more if reverse else True)
+        return rows
+
+    def _seek(self, updated_at, pk, reverse):
+        # Postgres sorts NULL updated_at first in DESC order and last in ASC order
+        u, i = self.updated_field, self.id_field
+        if not reverse:
+            if updated_at is None:
+                return Q(**{f"{u}__isnull": True, f"{i}__lt": pk}) | Q(**{f"{u}__isnull": False})
+            return Q(**{f"{u}__lt": updated_at}) | Q(**{u: updated_at, f"{i}__lt": pk})
+        if updated_at is None:
+            return Q(**{f"{u}__isnull": True, f"{i}__gt": pk})
+        return Q(**{f"{u}__gt": updated_at}) | Q(**{u: updated_at, f"{i}__gt": pk}) | Q(**{f"{u}__isnull": True})
+
+    def _encode_cursor(self, row, reverse=False):
+        updated_at = getattr(row, self.updated_field)
+        payload = {
+            "u": updated_at.isoformat() if updated_at else None,
+            "i": getattr(row, self.id_field),
+            "r": reverse,
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def _decode_cursor(self, raw):
+        if not raw:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(raw.encode()))
+            updated_at = datetime.fromisoformat(payload["u"]) if payload["u"] else None
+            return (updated_at, int(payload["i"])), bool(payload.get("r"))
+        except (ValueError, KeyError, TypeError):
+            raise NotFound("Invalid cursor.")
+
+    def _count_requested(self):
+        return self.request.query_params.get(self.count_query_param, "").lower() in ("1", "true", "yes")
+
+    def _get_count(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+        key = f"property-count:{get_version(PROPERTY_DATA)}:{digest}"
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.COUNT_CACHE_TIMEOUT)
+        return count
+
+    def _link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, self._encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "status": True,
+            "message": "Properties fetched successfully",
+            "data": {
+                "count": self.count,
+                "current_page": None,
+                "next_page_url": self.get_next_link(),
+                "previous_page_url": self.get_previous_link(),
+                "results": data
+            },
+            "errors": None
+        })
+
+
+class PropertyListView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request: Request):
-        # Annotate each property with total unit count
-        properties = Property.objects.annotate(
-            subunit_count=Sum('property_units__unit_count')
-        )
-        paginator = CustomPagination()
+        # Paginate on the narrow (id, updated_at) rows, then render the page with
+        # the fast PropertySerializer-equivalent plan in a single joined query
+        properties = Property.objects.only("id", "updated_at")
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination(page_size=CustomPagination.page_size)
+        else:
+            paginator = CustomPagination()
         paginator.request = request
         paginated_qs = paginator.paginate_queryset(properties, request)
-        serializer = PropertySerializer(paginated_qs, many=True, context={'request': request})
-        return paginator.get_paginated_response(serializer.data)
+        results = serialize_properties(PROPERTY_LIST_PLAN, [prop.id for prop in paginated_qs], request)
+        return paginator.get_paginated_response(results)
     
 class LargePagination(PageNumberPagination):
     page_size = 250  # show 250 items per page
@@ -64,20 +196,20 @@ class LargePagination(PageNumberPagination):
             "errors": None
         })
 
-class PropertyList250View(APIView):
+class PropertyList250View(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request: Request):
-        # Annotate each property with total unit count (if needed, optional)
-        properties = Property.objects.annotate(
-            subunit_count=Sum('property_units__unit_count')
-        )
+        properties = Property.objects.only("id", "title", "updated_at")
 
-        paginator = LargePagination()
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination(page_size=LargePagination.page_size)
+        else:
+            paginator = LargePagination()
         paginator.request = request
         paginated_qs = paginator.paginate_queryset(properties, request)
 
-        serializer = PropertyBasicSerializer(paginated_qs, many=True, context={'request': request})
+        results = serialize_rows(PROPERTY_BASIC_PLAN, [(prop.id, prop.title) for prop in paginated_qs])
 
-        return paginator.get_paginated_response(serializer.data)
+        return paginator.get_paginated_response(results)
 
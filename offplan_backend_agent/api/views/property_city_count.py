@@ -1,7 +1,9 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from api.models import Property, PropertyStatus
+from api.models import Property
+from api.reference_lookup import get_reference_lookup, normalize_name
+from api.response_cache import CachedResponseMixin
 from rest_framework.permissions import AllowAny
 from django.db.models import Count
 from drf_yasg.utils import swagger_auto_schema
@@ -16,7 +18,7 @@ status_param = openapi.Parameter(
     enum=["Ready", "Off Plan", "Sold Out", "Total"],  # ✅ Added Total
 )
 
-class PropertyByStatusView(APIView):
+class PropertyByStatusView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(manual_parameters=[status_param])
@@ -30,11 +32,13 @@ class PropertyByStatusView(APIView):
                 "errors": None
             }, status=status.HTTP_200_OK)
 
+        lookup = get_reference_lookup()
+
         # Handle Total separately
         if status_name.lower() == "total":
             city_data = (
                 Property.objects
-                .values('city__id', 'city__name')
+                .values('city_id')
                 .annotate(property_count=Count('id'))
                 .order_by('-property_count')
             )
@@ -42,8 +46,8 @@ class PropertyByStatusView(APIView):
             results = []
             for city in city_data:
                 results.append({
-                    "city_id": city['city__id'],
-                    "city_name": city['city__name'],
+                    "city_id": city['city_id'],
+                    "city_name": lookup.name("city", city['city_id']),
                     "property_count": city['property_count'],
                     "filter_status": "Total"
                 })
@@ -56,8 +60,8 @@ class PropertyByStatusView(APIView):
             }, status=status.HTTP_200_OK)
 
         # Handle Ready / Off Plan / Sold Out
-        property_status = PropertyStatus.objects.filter(name__iexact=status_name).first()
-        if not property_status:
+        status_ids = lookup.resolve("property_status", status_name, exact=True)
+        if not status_ids:
             return Response({
                 "status": False,
                 "message": f"No matching PropertyStatus for '{status_name}'",
@@ -65,9 +69,14 @@ class PropertyByStatusView(APIView):
                 "errors": None
             }, status=status.HTTP_404_NOT_FOUND)
 
-        properties = Property.objects.filter(property_status=property_status)
+        # English, Arabic and Farsi variants resolve to separate statuses; count them all
+        properties = Property.objects.filter(property_status_id__in=status_ids)
+        names = [lookup.name("property_status", pk) for pk in sorted(status_ids)]
+        filter_status = next(
+            (name for name in names if name and normalize_name(name) == normalize_name(status_name)), names[0]
+        )
         city_data = (
-            properties.values('city__id', 'city__name')
+            properties.values('city_id')
             .annotate(property_count=Count('id'))
             .order_by('-property_count')
         )
@@ -75,10 +84,10 @@ class PropertyByStatusView(APIView):
         results = []
         for city in city_data:
             results.append({
-                "city_id": city['city__id'],
-                "city_name": city['city__name'],
+                "city_id": city['city_id'],
+                "city_name": lookup.name("city", city['city_id']),
                 "property_count": city['property_count'],
-                "filter_status": property_status.name
+                "filter_status": filter_status
             })
 
         return Response({
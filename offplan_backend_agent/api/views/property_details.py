@@ -4,14 +4,16 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from api.models import Property
 from api.property_serializers import PropertyDetailSerializer
+from api.query_plan import apply_query_plan
+from api.response_cache import CachedResponseMixin
 
 
-class PropertyDetailView(APIView):
+class PropertyDetailView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, id):
         try:
-            prop = Property.objects.get(id=id)
+            prop = apply_query_plan(Property.objects.all(), PropertyDetailSerializer).get(id=id)
             serializer = PropertyDetailSerializer(prop, context={'request': request})
 
             return Response({
@@ -2,17 +2,30 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from api.models import Property
-from api.serializers import PropertySerializer
+from api.models import PropertySearchDocument
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .properties_list import CustomPagination
+from api.reference_lookup import resolve_ids
+from api.fast_serializers import PROPERTY_LIST_PLAN, serialize_properties
+from .properties_list import CustomPagination, KeysetPagination
+from api.response_cache import CachedResponseMixin
 
 import calendar
 from datetime import datetime
-from django.db.models import Case, When, Value, IntegerField, Q, Sum
+from django.db.models import Case, When, Value, IntegerField, Q
 
-class FilterPropertiesView(APIView):
+ID_FILTERS = [
+    "city_id", "district_id", "developer_id",
+    "property_type_id", "property_status_id", "sales_status_id",
+]
+
+# Request fields holding a reference name (see api.reference_lookup.REFERENCE_TABLES)
+NAME_FILTERS = [
+    "city", "district", "developer",
+    "property_type", "property_status", "sales_status",
+]
+
+class FilterPropertiesView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(
@@ -33,50 +46,55 @@ class FilterPropertiesView(APIView):
                 'sales_status': openapi.Schema(type=openapi.TYPE_STRING),
                 'title': openapi.Schema(type=openapi.TYPE_STRING, description="Filter by title"),
                 'developer': openapi.Schema(type=openapi.TYPE_STRING, description="Filter by developer name"),
+                'city_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'district_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'developer_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'property_type_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'property_status_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'sales_status_id': openapi.Schema(type=openapi.TYPE_INTEGER),
             },
         )
     )
     def post(self, request):
         data = request.data
-        
-        # Start with base queryset including subunit_count annotation
-        queryset = Property.objects.annotate(
-            subunit_count=Sum('property_units__unit_count')
-        ).order_by('-updated_at')
 
-        # Apply filters
-        queryset = self._apply_filters(queryset, data)
-        
-        # Apply ordering
-        queryset = self._apply_ordering(queryset, data)
-        
-        # Paginate results
-        paginator = CustomPagination()
-        paginator.request = request
-        paginated_qs = paginator.paginate_queryset(queryset.distinct(), request)
-        serializer = PropertySerializer(paginated_qs, many=True, context={'request': request})  
-        
-        return paginator.get_paginated_response(serializer.data)
+        # Filter and order on the denormalized search documents (no joins)
+        documents = self._apply_filters(PropertySearchDocument.objects.all(), data)
+        documents = self._apply_ordering(documents, data)
+
+        # Paginate property ids, then load only the properties of this page.
+        # Title searches are ordered by match priority, so they keep page numbers.
+        if KeysetPagination.requested(request) and not data.get("title"):
+            paginator = KeysetPagination(page_size=CustomPagination.page_size, id_field="property_id")
+            page = paginator.paginate_queryset(documents.only("property_id", "updated_at"), request)
+            page_ids = [doc.property_id for doc in page]
+        else:
+            paginator = CustomPagination()
+            paginator.request = request
+            page_ids = paginator.paginate_queryset(documents.values_list("property_id", flat=True), request)
+
+        results = serialize_properties(PROPERTY_LIST_PLAN, list(page_ids), request)
+        return paginator.get_paginated_response(results)
 
     def _apply_filters(self, queryset, data):
-        """Apply all filters to the queryset"""
-        
-        # Location filters
-        if city := data.get("city"):
-            queryset = queryset.filter(city__name__icontains=city)
+        """Apply all filters to the search document queryset"""
 
-        if district := data.get("district"):
-            queryset = queryset.filter(district__name__icontains=district)
+        # Exact reference ids
+        for field in ID_FILTERS:
+            if value := data.get(field):
+                queryset = queryset.filter(**{field: value})
 
-        # Property type and unit filters
-        if prop_type := data.get("property_type"):
-            queryset = queryset.filter(property_type__name__icontains=prop_type)
+        # Names (city, district, type, statuses, developer) resolved to ids in memory
+        for field in NAME_FILTERS:
+            if name := data.get(field):
+                queryset = queryset.filter(**{f"{field}_id__in": resolve_ids(field, name)})
 
+        # Unit filters
         if unit_type := data.get("unit_type"):
-            queryset = queryset.filter(grouped_apartments__unit_type__icontains=unit_type)
+            queryset = queryset.filter(unit_types__icontains=unit_type)
 
         if rooms := data.get("rooms"):
-            queryset = queryset.filter(grouped_apartments__rooms=rooms)
+            queryset = queryset.filter(rooms__contains=[rooms])
 
         # Delivery year filter
         if delivery_year := data.get("delivery_year"):
@@ -94,17 +112,6 @@ class FilterPropertiesView(APIView):
         if max_area := data.get("max_area"):
             queryset = queryset.filter(min_area__lte=max_area)
 
-        # Status filters
-        if property_status := data.get("property_status"):
-            queryset = queryset.filter(property_status__name__icontains=property_status)
-
-        if sales_status := data.get("sales_status"):
-            queryset = queryset.filter(sales_status__name__icontains=sales_status)
-
-        # Developer filter
-        if developer := data.get("developer"):
-            queryset = queryset.filter(developer__name__icontains=developer)
-
         return queryset
 
     def _filter_by_delivery_year(self, queryset, delivery_year):
@@ -142,8 +149,8 @@ class FilterPropertiesView(APIView):
                 )
             ).filter(
                 Q(title__icontains=title)
-            ).order_by('title_priority', '-updated_at')
+            ).order_by('title_priority', '-updated_at', '-property_id')
         else:
-            queryset = queryset.order_by("-updated_at")
+            queryset = queryset.order_by("-updated_at", "-property_id")
             
         return queryset
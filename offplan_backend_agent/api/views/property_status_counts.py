@@ -2,8 +2,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from api.models import Property
+from api.response_cache import CachedResponseMixin
 
-class PropertyStatusCountView(APIView):
+class PropertyStatusCountView(CachedResponseMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
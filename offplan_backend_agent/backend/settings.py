@@ -258,6 +258,27 @@ DATABASES = {
 
 
 
+# Cache used by api/response_cache.py for the public property endpoints.
+# Entries are keyed on the property-data version bumped by the import
+# commands, so a per-process cache is safe; set REDIS_URL to share it.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'offplan-response-cache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 60 * 60))
+
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,  # 👈 Prevents Django login for Swagger
 }
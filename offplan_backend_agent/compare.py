@@ -1,6 +1,5 @@
 import os
 import django
-import requests
 from datetime import datetime, timezone
 
 # Setup Django
@@ -8,24 +7,14 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 django.setup()
 
 from api.models import Property
-
-API_KEY = os.environ.get("ESTATY_API_KEY")
-HEADERS = {
-    "App-key": API_KEY,
-    "Content-Type": "application/json",
-}
-EXTERNAL_API_URL = "https://panel.estaty.app/api/v1/latestUpdatedProperties"
+from api.estaty_client import shared_client
 
 def fetch_latest_external():
     try:
-        response = requests.post(EXTERNAL_API_URL, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        if isinstance(data, dict) and isinstance(data.get("properties"), list):
-            return data["properties"]
-        else:
-            print("⚠️ Unexpected response format:", data)
-            return []
+        properties = shared_client().latest_updated_properties()
+        if not properties:
+            print("⚠️ No properties in the /latestUpdatedProperties response")
+        return properties
     except Exception as e:
         print(f"❌ Error fetching external properties: {e}")
         return []
@@ -11,30 +11,20 @@ from api.models import (
     PropertyStatus, SalesStatus, Facility, PropertyUnit,
     GroupedApartment, PropertyImage, PaymentPlan, PaymentPlanValue
 )
+from api.estaty_client import shared_client
 
 log = logging.getLogger("django")
 
-LISTING_URL = "https://panel.estaty.app/api/v1/getProperties"
-SINGLE_PROPERTY_URL = "https://panel.estaty.app/api/v1/getProperty"
 API_KEY = os.getenv("ESTATY_API_KEY")
 
 if not API_KEY:
     raise RuntimeError("❌ Missing ESTATY_API_KEY in Django settings.")
 
-HEADERS = {
-    "App-key": API_KEY,
-    "Content-Type": "application/json",
-}
-
 
 def fetch_external_properties(page):
     try:
-        url = f"{LISTING_URL}?page={page}"
         log.info(f"🌐 Fetching properties from page {page}")
-        response = requests.post(url, headers=HEADERS, json={})
-        response.raise_for_status()
-        data = response.json()
-        return data.get("properties", {}).get("data", [])
+        return shared_client().get_properties(page)
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch page {page}: {e}")
         return []
@@ -43,10 +33,7 @@ def fetch_external_properties(page):
 def fetch_property_by_id(prop_id):
     try:
         log.info(f"📥 Fetching details for property ID {prop_id}")
-        response = requests.post(SINGLE_PROPERTY_URL, headers=HEADERS, json={"id": prop_id})
-        response.raise_for_status()
-        data = response.json()
-        return data.get("property")
+        return shared_client().get_property(prop_id)
     except requests.RequestException as e:
         log.error(f"❌ Failed to fetch property ID {prop_id}: {e}")
         return None